@@ -0,0 +1,195 @@
+#latency, memory and payload benchmark of the dashboard callbacks
+#
+#the callbacks are driven through Dash's own /_dash-update-component route,
+#so timings include data access, computation and JSON serialization;
+#upstream responses come from recorded fixtures (see datasource.py):
+#
+#   DASHBOARD_DATA_SOURCE=record python benchmarks/bench_callbacks.py --repeat 1
+#   python benchmarks/bench_callbacks.py
+#
+#memory (web MiB) is traced in the web process only; portfolio jobs run in
+#pool processes and are not part of it
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'financial_dashboard'))
+
+TICKERS = ['KGHM', 'KRUK', 'TSGAMES', 'PKOBP', 'PZU', 'CDPROJEKT',
+           'PKNORLEN', 'PEKAO', 'LPP', 'CCC', 'ORANGEPL', 'JSW']
+CURRENCIES = ['USD', 'EUR', 'CHF', 'GBP', 'JPY', 'CZK', 'NOK', 'SEK', 'HUF', 'CAD']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the dashboard callbacks')
+    parser.add_argument('--end', default='2019-12-31',
+                        help='last day of the stock date ranges')
+    parser.add_argument('--tickers', type=int, nargs='+', default=[2, 5, 10])
+    parser.add_argument('--days', type=int, nargs='+', default=[90, 365, 1825])
+    parser.add_argument('--tries', type=int, nargs='+', default=[1000, 8000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warm', action='store_true',
+                        help='keep figure and price caches between repeats')
+    parser.add_argument('--json', help='also write the results to this file')
+    return parser.parse_args()
+
+
+def prop(component, name, value):
+    return {'id': component, 'property': name, 'value': value}
+
+
+#body of the request the browser sends when the inputs change
+def payload(outputs, inputs, state=()):
+    outputs = [{'id': component, 'property': name} for component, name in outputs]
+    if len(outputs) == 1:
+        output = '{id}.{property}'.format(**outputs[0])
+        outputs = outputs[0]
+    else:
+        output = '..' + '...'.join('{id}.{property}'.format(**o) for o in outputs) + '..'
+    return {'output': output,
+            'outputs': outputs,
+            'inputs': list(inputs),
+            'state': list(state),
+            'changedPropIds': ['{id}.{property}'.format(**inputs[0])]}
+
+
+class Bench:
+    def __init__(self, app, reset, repeat):
+        self.client = app.server.test_client()
+        self.reset = reset
+        self.repeat = repeat
+        self.results = []
+
+    def post(self, body):
+        response = self.client.post('/_dash-update-component', json=body)
+        if response.status_code not in (200, 204):
+            raise RuntimeError('{} {}'.format(response.status_code,
+                                              response.get_data(as_text=True)[:200]))
+        return response
+
+    def measure(self, name, scenario, call):
+        times, peaks, sizes = [], [], []
+        for _ in range(self.repeat):
+            self.reset()
+            tracemalloc.start()
+            start = time.perf_counter()
+            size = call()
+            times.append(time.perf_counter() - start)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            sizes.append(size)
+        row = {'callback': name,
+               'scenario': scenario,
+               'p50_ms': float(np.percentile(times, 50)) * 1000,
+               'p95_ms': float(np.percentile(times, 95)) * 1000,
+               'web_peak_mib': max(peaks) / 2**20,
+               'payload_kib': max(sizes) / 2**10}
+        self.results.append(row)
+        print('{callback:<28} {scenario:<32} {p50_ms:>9.1f} {p95_ms:>9.1f} '
+              '{web_peak_mib:>9.1f} {payload_kib:>11.1f}'.format(**row), flush=True)
+
+    def request(self, body):
+        return lambda: len(self.post(body).get_data())
+
+    #first paint plus every poll until the last random set is drawn
+    def sharpe_until_done(self, body, outputs, state):
+        def call():
+            response = self.post(body)
+            size = len(response.get_data())
+            result = json.loads(response.get_data())['response']
+            while not result['sharpe_poll']['disabled']:
+                time.sleep(0.05)
+                poll = payload(outputs,
+                               [prop('apply_button', 'n_clicks', 1),
+                                prop('sharpe_poll', 'n_intervals', 1)],
+                               state + [prop('sharpe_job', 'data', result['sharpe_job']['data'])])
+                poll['changedPropIds'] = ['sharpe_poll.n_intervals']
+                response = self.post(poll)
+                size = len(response.get_data())
+                result = json.loads(response.get_data())['response']
+            return size
+        return call
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault('DASHBOARD_DATA_SOURCE', 'replay')
+    os.environ.setdefault('DASHBOARD_CACHE_DIR', tempfile.mkdtemp(prefix='dashboard-bench-'))
+
+    import financial
+    from figure_cache import figure_cache
+    from prices import price_cache
+    from shared_cache import shared_cache
+
+    def reset():
+        if not args.warm:
+            figure_cache.clear()
+            price_cache.clear()
+            shared_cache.clear()
+
+    bench = Bench(financial.app, reset, args.repeat)
+    end = date.fromisoformat(args.end)
+    print('{:<28} {:<32} {:>9} {:>9} {:>9} {:>11}'.format(
+        'callback', 'scenario', 'p50 ms', 'p95 ms', 'web MiB', 'payload KiB'))
+
+    bench.measure('update_indices', 'snapshot', bench.request(payload(
+        [('indices', 'figure')], [prop('interval', 'n_intervals', 1)])))
+    bench.measure('update_exchange_rates', 'snapshot', bench.request(payload(
+        [('currencies', 'figure')], [prop('interval_curr', 'n_intervals', 1)])))
+    bench.measure('poller indices', 'refresh',
+                  lambda: len(json.dumps(financial.poller.refresh('indices'), default=str)))
+    bench.measure('poller exchange_rates', 'refresh',
+                  lambda: len(json.dumps(financial.poller.refresh('exchange_rates'), default=str)))
+
+    for count in [n for n in args.tickers if n <= len(CURRENCIES)]:
+        bench.measure('update_curr_chart', '{} currencies'.format(count), bench.request(payload(
+            [('curr-graph', 'figure')], [prop('menu_currs', 'value', CURRENCIES[:count])])))
+
+    for count in args.tickers:
+        ticks = TICKERS[:count]
+        for days in args.days:
+            dates = [prop('date-picker', 'start_date', (end - timedelta(days=days)).isoformat()),
+                     prop('date-picker', 'end_date', end.isoformat())]
+            click = [prop('apply_button', 'n_clicks', 1)]
+            scenario = '{} tickers, {} days'.format(count, days)
+
+            bench.measure('update_line', scenario, bench.request(payload(
+                [('line-graph', 'figure')], click,
+                [prop('dropdown', 'value', ticks)] + dates + [prop('viewport', 'data', 1600)])))
+            bench.measure('update_candle', scenario, bench.request(payload(
+                [('candle-graph', 'figure')], click,
+                [prop('candle_dropdown', 'value', ticks[0])] + dates + [prop('viewport', 'data', 1600)])))
+
+            for tries in args.tries:
+                for solver in ['random', 'frontier']:
+                    if solver == 'frontier' and tries != args.tries[0]:
+                        continue
+                    outputs = [('sharpe', 'figure'), ('sharpe_job', 'data'),
+                               ('sharpe_poll', 'disabled'), ('sharpe_progress', 'children')]
+                    state = ([prop('dropdown', 'value', ticks),
+                              prop('slider', 'value', tries),
+                              prop('solver', 'value', solver)] + dates)
+                    body = payload(outputs,
+                                   click + [prop('sharpe_poll', 'n_intervals', 0)],
+                                   state + [prop('sharpe_job', 'data', None)])
+                    body['changedPropIds'] = ['apply_button.n_clicks']
+                    label = scenario + (', {} sets'.format(tries) if solver == 'random' else ', frontier')
+                    bench.measure('update_sharpe', label, bench.request(body))
+                    bench.measure('update_sharpe (complete)', label,
+                                  bench.sharpe_until_done(body, outputs, state))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(bench.results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#CPU cost of scraping index quotes from saved stooq pages, old per-index
+#BeautifulSoup lookups against the single-pass extractor, as the number
+#of tracked indices grows
+#
+#pages are the saved pages in benchmarks/fixtures (a synthetic 400-row
+#quotes table in stooq's layout, the six default indices first) and the
+#stooq responses among the recorded fixtures (see datasource.py), or html
+#files given on the command line:
+#
+#   python benchmarks/bench_quotes.py
+#   python benchmarks/bench_quotes.py page.html
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'financial_dashboard'))
+PAGES_DIR = os.path.join(HERE, 'fixtures')
+
+import quotes
+from datasource import FIXTURES_DIR
+from market import STOOQ_URL
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the stooq quotes extractor')
+    parser.add_argument('pages', nargs='*', help='saved html pages')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[6, 24, 96])
+    parser.add_argument('--repeat', type=int, default=20)
+    return parser.parse_args()
+
+
+def load_pages(args):
+    paths = args.pages or [os.path.join(PAGES_DIR, name) for name in sorted(os.listdir(PAGES_DIR))
+                           if name.endswith('.html')]
+    pages = []
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            pages.append((os.path.basename(path), f.read()))
+    if not args.pages and os.path.isdir(args.fixtures):
+        for name in sorted(os.listdir(args.fixtures)):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(args.fixtures, name)) as f:
+                fixture = json.load(f)
+            if fixture['url'].startswith(STOOQ_URL) and fixture['status'] == 200:
+                body = base64.b64decode(fixture['body']).decode('utf-8', errors='replace')
+                pages.append((name, body))
+    return pages
+
+
+#the lookup the dashboard used before: one tree walk per index and value
+def legacy_quotes(page, symbols):
+    soup = BeautifulSoup(page, 'html.parser')
+    found = {}
+    for symbol in symbols:
+        node = soup.find(text=symbol)
+        if node is None:
+            continue
+        rate = float(node.next_element.next_sibling.text)
+        try:
+            change = float(node.next_element.next_sibling.next_sibling.next_sibling.text)
+        except (AttributeError, ValueError):
+            change = None
+        found[symbol] = (rate, change)
+    return found
+
+
+#every cell followed by a number two cells later is taken as a symbol
+def page_symbols(page):
+    symbols = []
+    for cells in quotes.table_rows(page):
+        for i, cell in enumerate(cells[:len(cells)-quotes.RATE_CELL]):
+            if cell.strip() and quotes._number(cell) is None \
+                    and quotes._number(cells[i+quotes.RATE_CELL]) is not None:
+                symbols.append(cell.strip())
+                break
+    return list(dict.fromkeys(symbols))
+
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return result, float(np.percentile(times, 50)) * 1000
+
+
+#extract_quotes with the lxml backend switched off when lxml_html is None
+def extract(page, symbols, backend=quotes.lxml_html):
+    saved = quotes.lxml_html
+    quotes.lxml_html = backend
+    try:
+        return quotes.extract_quotes(page, symbols)
+    finally:
+        quotes.lxml_html = saved
+
+
+def main():
+    args = parse_args()
+    pages = load_pages(args)
+    if not pages:
+        sys.exit('no stooq pages: record fixtures with DASHBOARD_DATA_SOURCE=record '
+                 'or pass html files')
+
+    extractors = [('stdlib single pass', lambda page, symbols: extract(page, symbols, None))]
+    if BeautifulSoup is not None:
+        extractors.insert(0, ('bs4 per index', legacy_quotes))
+    if quotes.lxml_html is not None:
+        extractors.append(('lxml single pass', extract))
+
+    print('{:<44} {:>8} {:<20} {:>9}'.format('page', 'indices', 'extractor', 'p50 ms'))
+    for name, page in pages:
+        symbols = page_symbols(page)
+        for size in sorted({min(size, len(symbols)) for size in args.sizes}):
+            reference = None
+            for label, func in extractors:
+                result, p50 = timed(lambda: func(page, symbols[:size]), args.repeat)
+                if reference is None:
+                    reference = result
+                elif result != reference:
+                    print('  {} differs from {}'.format(label, extractors[0][0]))
+                print('{:<44} {:>8} {:<20} {:>9.2f}'.format(name[:44], size, label, p50))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+//callbacks that only reshape their input run in the browser, without a
+//round-trip to the server
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    dashboard: {
+        //options of the candlestick menu are the stocks picked above
+        candle_menu: function(value) {
+            return (value || []).map(function(tick) {
+                return {'label': tick, 'value': tick};
+            });
+        },
+
+        //time of the last index refresh in the browser's clock
+        last_update: function(n) {
+            var now = new Date();
+            var pad = function(x) { return ('0' + x).slice(-2); };
+            return 'Last update: ' + pad(now.getHours()) + ':' +
+                   pad(now.getMinutes()) + ':' + pad(now.getSeconds());
+        },
+
+        slider_label: function(value) {
+            return 'Number of sets: ' + value;
+        }
+    }
+});
@@ -0,0 +1,98 @@
+//patches the top bar in place with the quotes pushed from /events; only
+//changed values arrive, so an idle dashboard sends no requests; served only
+//when DASHBOARD_PUSH is on
+(function() {
+    if (!window.EventSource) {
+        return;
+    }
+    var graphs = {'indices': 'indices', 'exchange_rates': 'currencies'};
+    //intervals whose callbacks redraw a whole graph
+    var redraw = {'indices': 'interval', 'exchange_rates': 'interval_curr'};
+    //the intervals poll while the stream is down
+    var streaming = false;
+    var polling = true;
+
+    function sync() {
+        if (polling !== streaming) {
+            return;
+        }
+        if (!window.dash_clientside || !window.dash_clientside.set_props ||
+                !document.getElementById('indices')) {
+            //the layout is not rendered yet
+            setTimeout(sync, 500);
+            return;
+        }
+        polling = !streaming;
+        Object.keys(redraw).forEach(function(channel) {
+            window.dash_clientside.set_props(redraw[channel], {'disabled': !polling});
+        });
+    }
+
+    function plot(id) {
+        var graph = document.getElementById(id);
+        return graph && graph.querySelector('.js-plotly-plot');
+    }
+
+    function patch(channel, message) {
+        var gd = plot(graphs[channel]);
+        if (!gd || !gd.data || !window.Plotly) {
+            return;
+        }
+        var traces = {};
+        gd.data.forEach(function(trace, i) {
+            if (trace.title && trace.title.text) {
+                traces[trace.title.text] = i;
+            }
+        });
+        var names = Object.keys(message.values);
+        var unknown = names.some(function(name) { return !(name in traces); });
+        if (unknown || (message.order && message.order.length !== gd.data.length)) {
+            //another list of quotes, e.g. after a fallback: let Dash redraw
+            if (window.dash_clientside && window.dash_clientside.set_props) {
+                window.dash_clientside.set_props(redraw[channel], {'n_intervals': Date.now()});
+            }
+            return;
+        }
+        names.forEach(function(name) {
+            var rate = message.values[name][0];
+            var change = message.values[name][1];
+            var update = {'value': [rate]};
+            if (change !== null) {
+                update['delta.reference'] = [rate - change];
+            }
+            window.Plotly.restyle(gd, update, [traces[name]]);
+        });
+        if (channel === 'indices') {
+            var label = document.getElementById('upd_indx');
+            if (label) {
+                label.textContent = 'Last update: ' + message.updated;
+            }
+        }
+    }
+
+    function connect() {
+        var config = document.getElementById('_dash-config');
+        var prefix = config ? JSON.parse(config.textContent).requests_pathname_prefix : '/';
+        //the browser reconnects by itself and gets the full state again
+        var source = new EventSource(prefix + 'events');
+        source.addEventListener('open', function() {
+            streaming = true;
+            sync();
+        });
+        source.addEventListener('error', function() {
+            streaming = false;
+            sync();
+        });
+        Object.keys(graphs).forEach(function(channel) {
+            source.addEventListener(channel, function(event) {
+                patch(channel, JSON.parse(event.data));
+            });
+        });
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', connect);
+    } else {
+        connect();
+    }
+})();
@@ -0,0 +1,78 @@
+import bisect
+import re
+
+#most options sent to the browser for one search
+LIMIT = 30
+
+_WORD = re.compile(r'\w+')
+
+
+def _prefix_range(keys, prefix):
+    start = bisect.bisect_left(keys, (prefix,))
+    end = bisect.bisect_left(keys, (prefix + '\uffff',))
+    return keys[start:end]
+
+
+#typeahead over dropdown options; matches are ranked: exact code, code
+#prefix, prefix of a word in the name, then any substring of code or name
+class CompanyIndex:
+    def __init__(self, options, current):
+        self.options = list(options)
+        self.current = [option['value'] in current for option in self.options]
+        self._by_value = {option['value']: i for i, option in enumerate(self.options)}
+        self._codes = sorted((str(option['value']).lower(), i)
+                             for i, option in enumerate(self.options))
+        self._words = sorted((word, i)
+                             for i, option in enumerate(self.options)
+                             for word in set(_WORD.findall(str(option['label']).lower())))
+        texts = ['{} {}'.format(option['value'], option['label']).lower() for option in self.options]
+        self._text = '\n'.join(texts)
+        self._offsets = []
+        offset = 0
+        for text in texts:
+            self._offsets.append(offset)
+            offset += len(text) + 1
+
+    def _substring(self, text):
+        position = self._text.find(text)
+        while position != -1:
+            i = bisect.bisect_right(self._offsets, position) - 1
+            yield i
+            #continue after this entry
+            next_entry = self._offsets[i + 1] if i + 1 < len(self._offsets) else len(self._text)
+            position = self._text.find(text, next_entry)
+
+    def _candidates(self, text):
+        for code, i in _prefix_range(self._codes, text):
+            if code == text:
+                yield i
+        for code, i in _prefix_range(self._codes, text):
+            yield i
+        for word, i in _prefix_range(self._words, text):
+            yield i
+        yield from self._substring(text)
+
+    def search(self, text, include_outdated=False, limit=LIMIT):
+        text = (text or '').strip().lower()
+        if text:
+            candidates = self._candidates(text)
+        else:
+            candidates = range(len(self.options))
+        found, seen = [], set()
+        for i in candidates:
+            if i in seen or not (include_outdated or self.current[i]):
+                continue
+            seen.add(i)
+            found.append(self.options[i])
+            if len(found) == limit:
+                break
+        return found
+
+    #options for the dropdown: the matches plus the selected companies,
+    #which have to stay in the options to remain selected
+    def dropdown_options(self, text, selected=(), include_outdated=False, limit=LIMIT):
+        options = self.search(text, include_outdated, limit)
+        present = {option['value'] for option in options}
+        kept = [self.options[self._by_value[value]] for value in selected or []
+                if value not in present and value in self._by_value]
+        return kept + options
@@ -0,0 +1,99 @@
+import base64
+import hashlib
+import json
+import os
+import re
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+#live: talk to the upstreams, record: talk to them and save every response,
+#replay: answer from saved responses only
+MODE = os.environ.get('DASHBOARD_DATA_SOURCE', 'live')
+FIXTURES_DIR = os.environ.get(
+    'DASHBOARD_FIXTURES',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                 'benchmarks', 'fixtures'))
+
+_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def fixture_name(method, url):
+    return hashlib.sha1('{} {}'.format(method, url).encode()).hexdigest() + '.json'
+
+
+#urls with the dates taken out, so that windows relative to today still
+#replay on a later day
+def loose_url(url):
+    return _DATE.sub('DATE', url)
+
+
+class RecordingAdapter(HTTPAdapter):
+    def __init__(self, directory=FIXTURES_DIR, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        fixture = {'method': request.method,
+                   'url': request.url,
+                   'status': response.status_code,
+                   'headers': {k: v for k, v in response.headers.items()
+                               if k.lower() not in ('content-encoding', 'transfer-encoding')},
+                   'body': base64.b64encode(response.content).decode()}
+        path = os.path.join(self.directory, fixture_name(request.method, request.url))
+        with open(path + '.tmp', 'w') as f:
+            json.dump(fixture, f)
+        os.replace(path + '.tmp', path)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    def __init__(self, directory=FIXTURES_DIR):
+        super().__init__()
+        self.directory = directory
+        self._loose = None
+
+    def _loose_index(self):
+        if self._loose is None:
+            self._loose = {}
+            for name in sorted(os.listdir(self.directory)) if os.path.isdir(self.directory) else []:
+                if name.endswith('.json'):
+                    with open(os.path.join(self.directory, name)) as f:
+                        fixture = json.load(f)
+                    self._loose[(fixture['method'], loose_url(fixture['url']))] = name
+        return self._loose
+
+    def send(self, request, **kwargs):
+        name = fixture_name(request.method, request.url)
+        if not os.path.exists(os.path.join(self.directory, name)):
+            name = self._loose_index().get((request.method, loose_url(request.url)))
+        if name is None:
+            raise requests.ConnectionError('no recorded response for {}'.format(request.url),
+                                           request=request)
+        with open(os.path.join(self.directory, name)) as f:
+            fixture = json.load(f)
+        response = requests.Response()
+        response.status_code = fixture['status']
+        response.headers = CaseInsensitiveDict(fixture['headers'])
+        response._content = base64.b64decode(fixture['body'])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def install(session, mode=MODE, **adapter_kwargs):
+    if mode == 'record':
+        adapter = RecordingAdapter(**adapter_kwargs)
+    elif mode == 'replay':
+        adapter = ReplayAdapter()
+    else:
+        return
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
@@ -0,0 +1,64 @@
+import numpy as np
+
+#used until the browser has reported its size
+DEFAULT_WIDTH = 1200
+#the graphs sit in the 'eight columns' part of the page
+GRAPH_SHARE = 2 / 3
+POINTS_PER_PIXEL = 2
+PIXELS_PER_CANDLE = 2
+#daily bars are cheap, so a range of up to this many is never resampled
+MIN_CANDLES = 400
+
+
+def graph_width(window_width):
+    return int((window_width or DEFAULT_WIDTH) * GRAPH_SHARE)
+
+
+#largest-triangle-three-buckets; returns positions of the kept points, the
+#first and last point are always kept
+def lttb(x, y, threshold):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    kept = np.zeros(threshold, dtype=int)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[stop:next_stop].mean()
+        avg_y = y[stop:next_stop].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:stop] - y[a])
+                      - (x[a] - x[start:stop]) * (avg_y - y[a]))
+        a = start + np.nanargmax(area) if not np.isnan(area).all() else start
+        kept[i + 1] = a
+    kept[-1] = n - 1
+    return kept
+
+
+def downsample_line(series, window_width):
+    series = series.dropna()
+    threshold = graph_width(window_width) * POINTS_PER_PIXEL
+    kept = lttb(series.index.asi8, series.values, threshold)
+    return series.iloc[kept]
+
+
+#daily bars while they fit the graph, otherwise weekly or monthly ones
+def resample_candles(df, window_width):
+    max_bars = max(graph_width(window_width) // PIXELS_PER_CANDLE, MIN_CANDLES)
+    for freq in [None, 'W', 'M']:
+        if freq is None:
+            bars = df
+        else:
+            periods = df.index.to_period(freq)
+            bars = df.groupby(periods).agg({'Open': 'first',
+                                            'High': 'max',
+                                            'Low': 'min',
+                                            'Close': 'last'})
+            bars.index = bars.index.to_timestamp()
+        if len(bars) <= max_bars:
+            break
+    return bars, freq
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+#runs blocking upstream requests concurrently; at most per_host calls to
+#one upstream are in flight at a time and results keep the order of items
+class FetchExecutor:
+    def __init__(self, max_workers=16, per_host=4):
+        self.per_host = per_host
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix='fetch')
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host_slots(self, host):
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self._hosts[host]
+
+    def _call(self, host, func, item):
+        with self._host_slots(host):
+            return func(item)
+
+    def map(self, func, items, host):
+        items = list(items)
+        if len(items) == 1:
+            return [self._call(host, func, items[0])]
+        futures = [self._pool.submit(self._call, host, func, item)
+                   for item in items]
+        return [future.result() for future in futures]
+
+    async def amap(self, func, items, host):
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*[
+            loop.run_in_executor(self._pool, self._call, host, func, item)
+            for item in items])
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+fetcher = FetchExecutor()
@@ -0,0 +1,135 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+from plotly.utils import PlotlyJSONEncoder
+
+from metrics import span
+from shared_cache import SharedCache, CACHE_DIR
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    #uses orjson when installed, which writes NumPy arrays directly
+    from plotly.io.json import to_json_plotly as dumps
+except ImportError:
+    #plotly 4
+    def dumps(figure):
+        return json.dumps(figure, cls=PlotlyJSONEncoder)
+
+
+def loads(payload):
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def day(date):
+    return pd.Timestamp(date).date().isoformat()
+
+
+MAX_BYTES = 64*1024*1024
+#figures have a store of their own, so that its size cap only ever
+#evicts figures
+figure_store = SharedCache(os.path.join(CACHE_DIR, 'figures'), max_bytes=MAX_BYTES)
+
+
+#rendered figures keyed by normalized callback inputs; figures are kept as
+#serialized JSON, bounded by total size and age, and written through to a
+#shared store so every worker can serve them; the store is swept for
+#expired figures and capped in size as well
+class FigureCache:
+    def __init__(self, max_bytes=MAX_BYTES, ttl=60*15, shared=figure_store):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.shared = shared
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, key):
+        payload, stored_at = self._entries.pop(key)
+        self.size -= len(payload)
+
+    def _put(self, key, payload, stored_at):
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            self._entries[key] = (payload, stored_at)
+            self.size += len(payload)
+            while self.size > self.max_bytes:
+                self._evict(next(iter(self._entries)))
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] > self.ttl:
+                self._evict(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.shared is not None:
+            entry = self.shared.get(('figure',) + key)
+            if entry is not None:
+                self._put(key, *entry)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry[0]
+
+    def set(self, key, figure):
+        payload = dumps(figure)
+        stored_at = time.time()
+        self._put(key, payload, stored_at)
+        if self.shared is not None:
+            self.shared.set(('figure',) + key, (payload, stored_at), self.ttl)
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries),
+                    'bytes': self.size,
+                    'hits': self.hits,
+                    'misses': self.misses}
+
+
+figure_cache = FigureCache()
+
+
+#wraps a figure callback; key maps the callback arguments to the inputs
+#that decide the figure, so e.g. n_clicks does not split the cache
+def memoize_figure(key):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            cache_key = (func.__name__,) + tuple(key(*args))
+            payload = figure_cache.get(cache_key)
+            if payload is None:
+                figure = func(*args)
+                if figure is None:
+                    return figure
+                with span('render'):
+                    payload = figure_cache.set(cache_key, figure)
+            #a plain dict skips Plotly object construction and validation
+            return loads(payload)
+        return wrapper
+    return decorator
@@ -1,36 +1,40 @@
+import os
 import dash
 import dash_html_components as html
 import dash_core_components as dcc
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output, State, ClientsideFunction
 import plotly.graph_objects as go
 import plotly.express as px
-from bs4 import BeautifulSoup
 import numpy as np
 import pandas as pd
-import pandas_datareader as pdr
-import requests
-import json
 from datetime import datetime, timedelta
+from prices import get_prices, get_prices_many, price_cache
+from fx import get_fx_history
+from metadata import load_companies, load_currencies, company_options, currency_options
+from company_index import CompanyIndex
+from shared_cache import shared_cache
+from market import MarketPoller, fetch_indices, fetch_exchange_rates
+from downsample import downsample_line, resample_candles, graph_width
+from figure_cache import memoize_figure, figure_cache, day, loads
+from returns import ReturnsService
+from rolling import rolling_analytics
+from simulation import simulations, job_id, QueueFull
+from metrics import instrument, registry, span, fallback
+from push import Broadcaster
 
-cmps_all = pd.read_csv('https://raw.githubusercontent.com/wieckiewiczpiotr/sample/master/WSE_metadata.csv', 
-                       index_col='code')
-cmps_all['name'] = cmps_all['name'].str.split(',', expand=True)[0].str.split(
-    'for', expand=True)[1].str.lstrip()
-cmps_all['name'] = cmps_all['name'].fillna(cmps_all.index.to_series())
+cmps_all = load_companies()
 
 cmps_current = cmps_all[cmps_all['to_date'] == cmps_all['to_date'].max()].copy()
 cmps_outdated = cmps_all[(cmps_all['to_date'] != cmps_all['to_date'].max())].copy()
 
-dropdown_opts_all = [{'label':row[0], 'value':index} 
-                     for index, row in cmps_all.iterrows()]
-dropdown_opts_current = [{'label':row[0], 'value':index} 
-                         for index, row in cmps_current.iterrows()]
+returns_service = ReturnsService(cmps_all.index)
 
-req = requests.get('http://api.nbp.pl/api/exchangerates/tables/a/')
-curr_list = pd.DataFrame(data=json.loads(req.content)[0]['rates'])
+#the companies dropdown asks the server for matches as the user types
+company_index = CompanyIndex(company_options(cmps_all), set(cmps_current.index))
 
-dropdown_currs = [{'label':'{} ({})'.format(row[0], row[1]), 
-                   'value':row[1]} for index, row in curr_list.iterrows()]
+curr_list = load_currencies()
+
+dropdown_currs = currency_options(curr_list)
 
 tab_style = {'line-height':'6vh', 
              'padding': '0', 
@@ -39,8 +43,25 @@ tab_style_selected = {'line-height':'6vh',
                       'padding': '0', 
                       'backgroundColor':'#434247', 
                       'color':'white'}
-indices = ['WIG30', 'MWIG40', 'SWIG80', 'WIG_GAMES', 'WIG_BANKI', 'WIG_SPOZYW']
+#stooq symbols shown at the top, comma separated
+indices = os.environ.get('DASHBOARD_INDICES',
+                         'WIG30,MWIG40,SWIG80,WIG_GAMES,WIG_BANKI,WIG_SPOZYW').split(',')
 currencies = ['USD', 'EUR', 'CHF', 'GBP']
+#push changed quotes to open dashboards over /events instead of polling;
+#every open tab holds a connection, so only with threaded or green thread
+#workers (e.g. gunicorn --threads 32 or -k gevent), never with sync ones
+push = os.environ.get('DASHBOARD_PUSH', '0') == '1'
+poller = MarketPoller()
+if push:
+    broadcaster = Broadcaster()
+    poller.listen(broadcaster.publish)
+#workers share snapshots, so each refresh hits upstream once per host
+poller.add('indices', 60*2, lambda: shared_cache.get_or_set(
+    ('indices', tuple(indices)), lambda: fetch_indices(indices), ttl=60*2-10))
+poller.add('exchange_rates', 60*15, lambda: shared_cache.get_or_set(
+    ('exchange_rates', tuple(currencies)), lambda: fetch_exchange_rates(currencies), ttl=60*15-10))
+poller.start()
+
 colors = px.colors.cyclical.HSV
 colors_curr = px.colors.cyclical.Phase
 text = '''
@@ -77,18 +98,41 @@ speaking, the best portoflio is the one with the highest **Sharpe Ratio**.
 Return and volatility (risk) is calculated based on selected 
 stocks and time period.
 
+The efficient frontier mode computes the best attainable portfolios 
+directly: its dots (a line over the random sets in the both mode) show 
+the highest return for each level of risk, and the stars mark the minimum volatility and the maximum Sharpe Ratio 
+portfolios. It does not depend on the number of sets.
+
 **Bear in mind that the more sets of weights and the longer 
-time period the longer the graph will load.**
+time period the longer it takes until all of them are drawn.** The first 
+sets are shown right away and the rest fill in while they are computed.
+'''
+text_rolling = '''
+## Rolling risk and return
+Volatility and Sharpe Ratio of every selected stock and the correlation of 
+every pair of them, each computed over a window moving through the selected 
+time period. Volatility and Sharpe Ratio are annualized.
 '''
 
-app = dash.Dash(__name__)
+#assets/live.js is the client of /events
+app = dash.Dash(__name__, assets_ignore='' if push else r'live\.js')
 server = app.server
+#every callback below is timed; metrics are served on /metrics
+instrument(app)
+if push:
+    broadcaster.route(server)
+registry.cache('figure', figure_cache)
+registry.cache('price', price_cache)
+registry.cache('shared', shared_cache)
 app.layout = html.Div(children=[
     html.Div(children=[
         html.Div(
             className='eight columns div-graphs',
+            #with push on, assets/live.js pauses the intervals while /events
+            #is connected
             children=[dcc.Interval(id='interval', interval=1000*60*2, n_intervals=0),
                       dcc.Interval(id='interval_curr', interval=1000*60*15, n_intervals=0),
+                      dcc.Store(id='viewport'),
                       html.Div([dcc.Loading(id='loading_indices', 
                                             children=[html.Div([dcc.Graph(id='indices')], 
                                                               style={'height':70, 
@@ -154,11 +198,58 @@ app.layout = html.Div(children=[
                               
                               html.Div(id='slider_output', 
                                        style={'textAlign': 'left'}),
+
+                              dcc.RadioItems(
+                                  id='solver',
+                                  options=[
+                                      {'label': 'Random sets', 'value': 'random'},
+                                      {'label': 'Efficient frontier', 'value': 'frontier'},
+                                      {'label': 'Both', 'value': 'both'}],
+                                  value='random',
+                                  labelStyle={'display': 'inline-block', 
+                                              'marginRight': '20px'},
+                                  style={'textAlign': 'left', 
+                                         'marginTop': '15px'}),
+
+                              html.Div(id='sharpe_progress', 
+                                       style={'textAlign': 'left', 
+                                              'marginTop': '10px'}),
+                              dcc.Store(id='sharpe_job'),
+                              dcc.Interval(id='sharpe_poll', 
+                                           interval=500, 
+                                           disabled=True),
                               
+                              #the progress polls redraw the graph every half
+                              #second; a spinner only shows for slower updates
+                              #and leaves the graph visible under it
                               dcc.Loading(id='loading_sharpe',
+                                          delay_show=1000,
+                                          overlay_style={'visibility': 'visible',
+                                                         'opacity': 0.5},
                                           children=[html.Div([
                                               dcc.Graph(id='sharpe')],
                                               style={'marginTop':'40px'})]
+                                         ),
+
+                              html.Div([dcc.Markdown(text_rolling)], 
+                                       style={'textAlign': 'justify', 
+                                              'marginTop':'40px'}),
+                              dcc.RadioItems(
+                                  id='rolling_window',
+                                  options=[
+                                      {'label': '1 month', 'value': 21},
+                                      {'label': '3 months', 'value': 63},
+                                      {'label': '6 months', 'value': 126},
+                                      {'label': '1 year', 'value': 252}],
+                                  value=63,
+                                  labelStyle={'display': 'inline-block', 
+                                              'marginRight': '20px'},
+                                  style={'textAlign': 'left', 
+                                         'marginTop': '15px'}),
+                              dcc.Loading(id='loading_rolling',
+                                          children=[html.Div([
+                                              dcc.Graph(id='rolling')],
+                                              style={'marginTop':'20px'})]
                                          )], 
                                   style=tab_style, 
                                   selected_style=tab_style_selected)
@@ -193,7 +284,8 @@ app.layout = html.Div(children=[
                           html.Label(['Select one or multiple stocks',
                                       dcc.Dropdown(
                                       id='dropdown',
-                                      options=dropdown_opts_current,
+                                      options=company_index.dropdown_options(
+                                          '', ['KGHM', 'KRUK', 'TSGAMES']),
                                       multi=True,
                                       value=['KGHM', 'KRUK', 'TSGAMES'],
                                       placeholder='Select one or more companies',
@@ -231,37 +323,42 @@ app.layout = html.Div(children=[
                                       'marginTop':'70px'})])])])
 #--------------------------------------------------------------------------------------------------------------
 #callback for updating menu for candlestick chart
-@app.callback(Output('candle_dropdown', 'options'),
-              [Input('dropdown', 'value')])
-def update_candle_menu(value):
-    options = [{'label':tick, 'value':tick} for tick in value]
-    return options
+app.clientside_callback(
+    ClientsideFunction(namespace='dashboard', function_name='candle_menu'),
+    Output('candle_dropdown', 'options'),
+    [Input('dropdown', 'value')])
 
 #callback for showing last update
-@app.callback(Output('upd_indx', 'children'),
-              [Input('interval', 'n_intervals')])
-def update_upd_indx(n):
-    return 'Last update: {}'.format(datetime.now().strftime('%H:%M:%S'))
+app.clientside_callback(
+    ClientsideFunction(namespace='dashboard', function_name='last_update'),
+    Output('upd_indx', 'children'),
+    [Input('interval', 'n_intervals')])
 
 #callback for updating indices top of the app
 @app.callback(Output('indices', 'figure'),
               [Input('interval', 'n_intervals')])
 def update_indices(n):
-    rates = []
-    changes = []
-    traces = []
-    try:
-        req = requests.get("https://stooq.pl/t/?i=528")
-        soup = BeautifulSoup(req.text, 'html.parser')
-        for index in indices:
-            rates.append(float(soup.find(text=index).next_element.next_sibling.text))
-            try:
-                changes.append(float(soup.find(text=index).next_element.next_sibling.next_sibling.next_sibling.text))
-            except:
-                continue
-
-        if len(changes) == len(indices):
-            for number, index, rate, change in zip(range(len(indices)), indices, rates, changes):
+    with span('fetch'):
+        snapshot = poller.get('indices')
+    if snapshot is None:
+        fallback('indices', 'error_figure')
+        figure = {
+            'data': [go.Indicator(title='Could not connect to stooq to get index data',
+                                  title_font_size=20,
+                                  number_font_size=1)],
+            'layout': go.Layout(
+                      plot_bgcolor='#35353b',
+                      paper_bgcolor='#35353b',
+                      font={'color': 'tomato'},
+                      height=70)}
+        return figure
+
+    with span('render'):
+        traces = []
+        names = snapshot['names']
+        if snapshot['changes'] is not None:
+            for number, index, rate, change in zip(range(len(names)), names, 
+                                                   snapshot['rates'], snapshot['changes']):
                 traces.append(go.Indicator(
                     mode='number+delta',
                     title=index,
@@ -273,7 +370,7 @@ def update_indices(n):
                            'valueformat': '.2%'},
                     domain={'row': 1, 'column': number}))
         else:
-            for number, index, rate in zip(range(len(indices)), indices, rates):
+            for number, index, rate in zip(range(len(names)), names, snapshot['rates']):
                 traces.append(go.Indicator(
                     mode='number',
                     title=index,
@@ -285,164 +382,111 @@ def update_indices(n):
         figure = {'data': traces,
                   'layout': go.Layout(
                       grid={'rows': 1, 
-                            'columns': len(indices), 
+                            'columns': len(names), 
                             'pattern': "independent"},
                       margin=dict(t=30, b=0, l=0, r=0),
                       plot_bgcolor='#35353b',
                       paper_bgcolor='#35353b',
                       font={'color': '#d8d8d8'},
                       height=70)}
-        return figure
-    
-    except:  
-        try:
-            inds = ['WIG', 'WIG20', 'MWIG40', 'SWIG80', 'WIG_ODZIEZ', 'WIG_LEKI']
-            traces = []
-            for index, number in zip(inds, range(len(inds))):
-                code = 'WSE/' + index
-                df = pdr.get_data_quandl(
-                    code, 
-                    api_key='fHsXs9kzqak6UF1haCww', 
-                    start=datetime.today().date()-timedelta(days=5))
-                traces.append(go.Indicator(
-                        mode='number',
-                        title=index,
-                        title_font_size=14,
-                        number_font_size=20,
-                        value=df['Close'][0],
-                        domain={'row': 1, 
-                                'column': number}))
-                figure = {'data': traces,
-                      'layout': go.Layout(
-                          grid={'rows': 1, 
-                                'columns': len(inds), 
-                                'pattern': "independent"},
-                          margin=dict(t=30, b=0, l=0, r=0),
-                          plot_bgcolor='#35353b',
-                          paper_bgcolor='#35353b',
-                          font={'color': '#d8d8d8'},
-                          height=70)}
-            return figure
-        except:
-            figure = {
-                'data': [go.Indicator(title='Could not connect to stooq to get index data',
-                                      title_font_size=20,
-                                      number_font_size=1)],
-                'layout': go.Layout(
-                          plot_bgcolor='#35353b',
-                          paper_bgcolor='#35353b',
-                          font={'color': 'tomato'},
-                          height=70)}
-            return figure
+    return figure
 
 #callback for updating exchange rates at the top of the app
 @app.callback(Output('currencies', 'figure'),
               [Input('interval_curr', 'n_intervals')])
 def update_exchange_rates(n):
-    traces = []
-    try:
-        req1 = requests.get('https://free.currconv.com/api/v7/convert?q=USD_PLN,EUR_PLN&compact=ultra&apiKey=ed6303b119a9753725a8')
-        req2 = requests.get('https://free.currconv.com/api/v7/convert?q=CHF_PLN,GBP_PLN&compact=ultra&apiKey=ed6303b119a9753725a8')
-        usd = json.loads(req1.content)['USD_PLN']
-        eur = json.loads(req1.content)['EUR_PLN']
-        chf = json.loads(req2.content)['CHF_PLN']
-        gbp = json.loads(req2.content)['GBP_PLN']
-        curr = [usd, eur, chf, gbp]
-
-        for name, rate, number in zip(currencies, curr, range(len(currencies))):
+    with span('fetch'):
+        snapshot = poller.get('exchange_rates')
+    if snapshot is None:
+        fallback('exchange_rates', 'error_figure')
+        figure = {
+            'data': [go.Indicator(title='Could not connect to API to get exchange rates data',
+                                  title_font_size=15,
+                                  number_font_size=1)],
+            'layout': go.Layout(
+                      plot_bgcolor='#35353b',
+                      paper_bgcolor='#35353b',
+                      font={'color': 'tomato'},
+                      height=70)}
+        return figure
+
+    with span('render'):
+        traces = []
+        for name, rate, number in zip(snapshot['names'], snapshot['rates'], 
+                                      range(len(snapshot['names']))):
             traces.append(go.Indicator(
                 mode='number',
                 title=name,
                 title_font_size=14,
                 number_font_size=20,
                 value=rate,
-                number_valueformat = '.5f',
+                number_valueformat=snapshot['valueformat'],
                 domain={'row': 1, 'column': number}))
 
         figure = {'data': traces,
                   'layout': go.Layout(
                       grid={'rows': 1, 
-                            'columns': len(currencies), 
+                            'columns': len(snapshot['names']), 
                             'pattern': "independent"},
                       margin=dict(t=23, b=0, l=0, r=0),
                       plot_bgcolor='#35353b',
                       paper_bgcolor='#35353b',
                       font={'color': '#d8d8d8'},
                       height=60)}
-        return figure
-    except:
-        try:
-            req = requests.get('http://api.nbp.pl/api/exchangerates/tables/a/')
-            usd = json.loads(req.content)[0]['rates'][1]['mid']
-            eur = json.loads(req.content)[0]['rates'][7]['mid']
-            chf = json.loads(req.content)[0]['rates'][9]['mid']
-            gbp = json.loads(req.content)[0]['rates'][10]['mid']
-            curr = [usd, eur, chf, gbp]
-
-            for name, rate, number in zip(currencies, curr, range(len(currencies))):
-                traces.append(go.Indicator(
-                    mode='number',
-                    title=name,
-                    title_font_size=14,
-                    number_font_size=20,
-                    value=rate,
-                    number_valueformat = '.4f',
-                    domain={'row': 1, 'column': number}))
+    return figure
 
-            figure = {'data': traces,
-                      'layout': go.Layout(
-                          grid={'rows': 1, 
-                                'columns': len(currencies), 
-                                'pattern': "independent"},
-                          margin=dict(t=23, b=0, l=0, r=0),
-                          plot_bgcolor='#35353b',
-                          paper_bgcolor='#35353b',
-                          font={'color': '#d8d8d8'},
-                          height=60)}
-            return figure
-        
-        except:
-            figure = {
-                'data': [go.Indicator(title='Could not connect to API to get exchange rates data',
-                                      title_font_size=15,
-                                      number_font_size=1)],
-                'layout': go.Layout(
-                          plot_bgcolor='#35353b',
-                          paper_bgcolor='#35353b',
-                          font={'color': 'tomato'},
-                          height=70)}
-            return figure
-
-#callback for updating main ticks dropdown menu
+#callback for updating main ticks dropdown menu with the best matches
+#of what is typed, historically listed companies only if ticked
 @app.callback(Output('dropdown', 'options'),
-              [Input('check', 'value')])
-def update_dropdown(value):
-    if value == None or len(value) == 0:
-        return dropdown_opts_current
-    else:
-        return dropdown_opts_all
+              [Input('dropdown', 'search_value'),
+               Input('check', 'value')],
+              [State('dropdown', 'value')])
+def update_dropdown(search, check, value):
+    return company_index.dropdown_options(search, value, include_outdated=bool(check))
 
-@app.callback(Output('slider_output', 'children'),
-              [Input('slider', 'value')])
-def update_output(value):
-    return 'Number of sets: {}'.format(value)
+app.clientside_callback(
+    ClientsideFunction(namespace='dashboard', function_name='slider_label'),
+    Output('slider_output', 'children'),
+    [Input('slider', 'value')])
     
+#browser window width, used to size the data sent to the graphs
+app.clientside_callback(
+    'function(n) { return window.innerWidth; }',
+    Output('viewport', 'data'),
+    [Input('apply_button', 'n_clicks')])
+
+#trading days before the start that fill the first rolling window
+def rolling_lookback(window):
+    return pd.Timedelta(days=window*7//5 + 10)
+
+#the longest window of the rolling chart
+MAX_WINDOW = 252
+
+#every callback of an Apply click loads prices from here, so whichever
+#runs first downloads each ticker once, the rolling chart's lookback
+#included, and the others find them in the price cache
+def click_start(start_date):
+    return pd.Timestamp(day(start_date)) - rolling_lookback(MAX_WINDOW)
+
 #callback for updating main time-series graph
 @app.callback(Output('line-graph', 'figure'),
               [Input('apply_button', 'n_clicks')],
               [State('dropdown', 'value'),
                State('date-picker', 'start_date'),
-               State('date-picker', 'end_date')])
-def update_line(n, ticks, start_date, end_date):
+               State('date-picker', 'end_date'),
+               State('viewport', 'data')])
+@memoize_figure(lambda n, ticks, start_date, end_date, width: (
+    tuple(ticks), day(start_date), day(end_date), graph_width(width)//100))
+def update_line(n, ticks, start_date, end_date, width):
     traces = []
-    for name, color in zip(ticks, colors):
-        tick = 'WSE/' + name
-        df = pdr.get_data_quandl(tick, 
-                                 api_key='fHsXs9kzqak6UF1haCww', 
-                                 start=start_date, 
-                                 end=end_date)
-        traces.append({'x': df.index, 
-                       'y': df['Close'], 
+    with span('fetch'):
+        frames = [df.loc[day(start_date):] for df in
+                  get_prices_many(ticks, click_start(start_date), end_date)]
+    with span('compute'):
+        closes = [downsample_line(df['Close'], width) for df in frames]
+    for name, color, close in zip(ticks, colors, closes):
+        traces.append({'x': close.index, 
+                       'y': close.values, 
                        'name': name, 
                        'mode': 'lines',
                        'line': dict(color=color)
@@ -463,13 +507,18 @@ def update_line(n, ticks, start_date, end_date):
               [Input('apply_button', 'n_clicks')],
               [State('candle_dropdown', 'value'),
                State('date-picker', 'start_date'),
-               State('date-picker', 'end_date')])
-def update_candle(n, tick, start_date, end_date):
-    code = 'WSE/' + tick
-    df = pdr.get_data_quandl(code, 
-                             api_key='fHsXs9kzqak6UF1haCww', 
-                             start=start_date, 
-                             end=end_date)
+               State('date-picker', 'end_date'),
+               State('viewport', 'data')])
+@memoize_figure(lambda n, tick, start_date, end_date, width: (
+    tick, day(start_date), day(end_date), graph_width(width)//100))
+def update_candle(n, tick, start_date, end_date, width):
+    with span('fetch'):
+        df = get_prices(tick, click_start(start_date), end_date).loc[day(start_date):]
+    with span('compute'):
+        df, freq = resample_candles(df, width)
+    title = 'Candlestick chart for {}'.format(tick)
+    if freq is not None:
+        title += ' ({} bars)'.format({'W': 'weekly', 'M': 'monthly'}[freq])
     figure = {'data':[go.Candlestick(
         x=df.index,
         open=df['Open'],
@@ -479,7 +528,7 @@ def update_candle(n, tick, start_date, end_date):
         increasing_line_color= 'lime', 
         decreasing_line_color= 'red')],
              'layout': go.Layout(height=350,
-                                 title='Candlestick chart for {}'.format(tick),
+                                 title=title,
                                  plot_bgcolor='#434247',
                                  paper_bgcolor='#434247',
                                  yaxis={'gridcolor': '#35353b'},
@@ -491,16 +540,15 @@ def update_candle(n, tick, start_date, end_date):
 #callback for updating currencies chart
 @app.callback(Output('curr-graph', 'figure'),
               [Input('menu_currs', 'value')])
+@memoize_figure(lambda currs: (tuple(currs), day(datetime.today())))
 def update_curr_chart(currs):
     traces = []
-    for curr, color in zip(currs, colors_curr):
-        req = requests.get('http://api.nbp.pl/api/exchangerates/rates/a/{}/{}/{}/'.format(
-            curr,
-            datetime.today().date()-timedelta(days=364), 
-            datetime.today().date()))
-        df = pd.DataFrame(data=json.loads(req.content)['rates'])
-
-        traces.append({'x': df['effectiveDate'], 
+    with span('fetch'):
+        frames = get_fx_history(currs, 
+                                datetime.today().date()-timedelta(days=364), 
+                                datetime.today().date())
+    for curr, color, df in zip(currs, colors_curr, frames):
+        traces.append({'x': df.index, 
                        'y': df['mid'], 
                        'name': curr, 
                        'mode': 'lines',
@@ -515,66 +563,197 @@ def update_curr_chart(currs):
                   'margin': dict(t=30, b=30, l=60, r=60),
                   'font': {'color': '#d8d8d8'}}}
     return figure
-#callback for updating currencies chart
-@app.callback(Output('sharpe', 'figure'),
-              [Input('apply_button', 'n_clicks')],
+#above this many points the portfolio scatter is drawn with WebGL
+GL_THRESHOLD = 1000
+sharpe_colorscale = [[i/(len(px.colors.sequential.RdPu_r)-1), color]
+                     for i, color in enumerate(px.colors.sequential.RdPu_r)]
+
+#hover text is formatted in the browser: the weights of every stock come
+#as numeric customdata and the Sharpe Ratio is the marker color, unless
+#given for a single highlighted point
+def portfolio_hover(ticks, title=None, sharpe=None):
+    lines = ([title] if title else []) + [
+        'volatility=%{x:.4f}',
+        'returns=%{y:.4f}',
+        'sharpe=' + ('%{marker.color:.3f}' if sharpe is None else '{:.3f}'.format(sharpe))]
+    lines += ['{}=%{{customdata[{}]:.3f}}'.format(tick, i) for i, tick in enumerate(ticks)]
+    return '<br>'.join(lines) + '<extra></extra>'
+
+#figure for the portfolio selection tab; portfolios are the random sets
+#or the frontier points, extra holds the frontier overlay if requested
+def sharpe_figure(ticks, solver, portfolios, extra):
+    all_weights, ret_arr, vol_arr, sr_arr = portfolios
+    gl = len(ret_arr) > GL_THRESHOLD
+
+    traces = [{'type': 'scattergl' if gl else 'scatter',
+               'mode': 'markers',
+               #more digits than this do not show on the graph
+               'x': np.round(vol_arr, 5),
+               'y': np.round(ret_arr, 5),
+               'customdata': np.round(all_weights, 3),
+               'hovertemplate': portfolio_hover(ticks),
+               'showlegend': False,
+               'marker': {'size': 9,
+                          'color': np.round(sr_arr, 3),
+                          'colorscale': sharpe_colorscale,
+                          'showscale': True,
+                          'colorbar': {'title': {'text': 'sharpe'}},
+                          #outlines are what makes SVG markers slow
+                          'line': {'width': 0 if gl else 1}}}]
+
+    #in the frontier mode the markers above are the frontier points already
+    if solver == 'both':
+        frontier = extra['frontier']
+        traces.append({'type': 'scatter',
+                       'x': frontier[2], 
+                       'y': frontier[1], 
+                       'mode': 'lines',
+                       'name': 'Efficient frontier',
+                       'hoverinfo': 'skip',
+                       'line': dict(color='#d8d8d8', width=2)})
+    if solver != 'random':
+        for label, name, color in [('Minimum volatility', 'min_variance', 'deepskyblue'),
+                                   ('Maximum Sharpe Ratio', 'max_sharpe', 'gold')]:
+            weights, ret, vol, sr = extra[name]
+            traces.append({'type': 'scatter',
+                           'x': [vol], 
+                           'y': [ret],
+                           'mode': 'markers',
+                           'name': label,
+                           'customdata': [np.round(weights, 3)],
+                           'hovertemplate': portfolio_hover(ticks, label, sr),
+                           'marker': dict(symbol='star', size=18, color=color, 
+                                          line=dict(width=1, color='black'))})
+
+    figure = {'data': traces,
+              'layout': {
+                  'title': 'Portfolio allocation for {}'.format(', '.join(ticks)),
+                  'hovermode': 'closest',
+                  'yaxis': {'gridcolor': '#35353b', 'title': {'text': 'Returns'}},
+                  'xaxis': {'gridcolor': '#35353b', 'title': {'text': 'Volatility'}},
+                  'plot_bgcolor': '#434247',
+                  'paper_bgcolor': '#434247',
+                  'margin': dict(t=40, b=30, l=60, r=60),
+                  'font': {'color': '#d8d8d8'}}}
+    if solver != 'random':
+        figure['layout']['legend'] = dict(orientation='h', y=-0.2)
+    return figure
+
+#callback for updating portfolio selection graph; random sets are computed
+#in the background and the graph is redrawn as they arrive
+@app.callback([Output('sharpe', 'figure'),
+               Output('sharpe_job', 'data'),
+               Output('sharpe_poll', 'disabled'),
+               Output('sharpe_progress', 'children')],
+              [Input('apply_button', 'n_clicks'),
+               Input('sharpe_poll', 'n_intervals')],
               [State('dropdown', 'value'),
                State('slider', 'value'),
+               State('solver', 'value'),
                State('date-picker', 'start_date'),
-               State('date-picker', 'end_date')
+               State('date-picker', 'end_date'),
+               State('sharpe_job', 'data')
               ])
-def update_sharpe(n, ticks, tries, start_date, end_date):
-    if len(ticks) >= 2:
-        df = pd.DataFrame()
-        ret_arr = np.zeros(tries)
-        vol_arr = np.zeros(tries)
-        sr_arr = np.zeros(tries)
-
-        for name in ticks:
-            tick = 'WSE/' + name
-            df_tick = pdr.get_data_quandl(tick, 
-                                          api_key='fHsXs9kzqak6UF1haCww', 
-                                          start=start_date, 
-                                          end=end_date)
-            df_tick.rename({'Close': name}, axis=1, inplace=True)
-            df = df.join(df_tick[name], how='outer')
-
-        logs = np.log(df/df.shift(-1))
-        all_weights = np.zeros((tries, len(logs.columns)))
-
-        for i in range(tries):
-            weights = np.array(np.random.random(len(logs.columns)))
-            weights = weights/np.sum(weights)
-            all_weights[i,:] = weights
-            ret_arr[i] = np.sum(logs.mean() * weights * len(logs))
-            vol_arr[i] = np.sqrt(np.dot(weights.T, np.dot(logs.cov() * len(logs), weights)))
-            sr_arr[i] = ret_arr[i] / vol_arr[i]
-
-        weights_as_string = []
-        for weight in all_weights:
-            weights_as_string.append(', '.join(str(round(i, 3)) for i in weight))
-
-        df = pd.DataFrame({'returns': ret_arr,
-                           'volatility': vol_arr,
-                           'sharpe': sr_arr,
-                           'weights': weights_as_string})
-
-        figure = px.scatter(df, x='volatility', 
-                            y='returns', 
-                            color='sharpe',
-                            color_continuous_scale='RdPu_r',
-                            hover_data=['weights'])
-        
-        figure.update_traces(marker=dict(size=9, line=dict(width=1)))
-
-        figure.update_layout(
-                          title='Portfolio allocation for {}'.format(', '.join(ticks)),
-                          yaxis={'gridcolor': '#35353b'},
-                          xaxis={'gridcolor': '#35353b'},
-                          xaxis_title='Volatility',
-                          yaxis_title='Returns',
-                          plot_bgcolor='#434247',
-                          paper_bgcolor='#434247',
-                          margin=dict(t=40, b=30, l=60, r=60),
-                          font={'color': '#d8d8d8'})
-        return figure
\ No newline at end of file
+def update_sharpe(n, n_poll, ticks, tries, solver, start_date, end_date, job):
+    triggered = [t['prop_id'] for t in dash.callback_context.triggered]
+    if 'sharpe_poll.n_intervals' in triggered and job is not None:
+        with span('fetch'):
+            state = simulations.get(job)
+        if state is None:
+            return dash.no_update, None, True, ''
+    else:
+        if len(ticks) < 2:
+            return None, None, True, ''
+        key = ('update_sharpe', tuple(ticks), tries, solver, day(start_date), day(end_date))
+        payload = figure_cache.get(key)
+        if payload is not None:
+            return loads(payload), None, True, ''
+
+        with span('fetch'):
+            returns_service.ensure(ticks, click_start(start_date), end_date)
+            mean, cov, periods = returns_service.moments(ticks, start_date, end_date)
+        job = job_id(*key)
+        try:
+            state = simulations.start(job, mean, cov, periods,
+                                      tries if solver != 'frontier' else 0,
+                                      extra={'ticks': ticks, 'solver': solver, 'key': key},
+                                      frontier=solver != 'random')
+        except QueueFull:
+            return dash.no_update, None, True, 'The server is busy, please apply again in a moment'
+
+    extra = state['extra']
+    if state['error'] is not None:
+        return dash.no_update, None, True, 'Could not compute the portfolios'
+    if extra['solver'] == 'frontier':
+        portfolios = extra.get('frontier')
+    else:
+        portfolios = state['portfolios']
+    if portfolios is None:
+        return dash.no_update, job, False, 'Computing the portfolios...'
+    with span('render'):
+        figure = sharpe_figure(extra['ticks'], extra['solver'], portfolios, extra)
+    if state['finished']:
+        with span('render'):
+            figure_cache.set(extra['key'], figure)
+        return figure, None, True, ''
+    return figure, job, False, 'Computed {} of {} sets'.format(state['done'], state['total'])
+
+#more pairs than this are shown as their average correlation
+MAX_PAIRS = 10
+
+#callback for the rolling volatility, Sharpe Ratio and correlation graph
+@app.callback(Output('rolling', 'figure'),
+              [Input('apply_button', 'n_clicks'),
+               Input('rolling_window', 'value')],
+              [State('dropdown', 'value'),
+               State('date-picker', 'start_date'),
+               State('date-picker', 'end_date'),
+               State('viewport', 'data')])
+@memoize_figure(lambda n, window, ticks, start_date, end_date, width: (
+    tuple(ticks), window, day(start_date), day(end_date), graph_width(width)//100))
+def update_rolling(n, window, ticks, start_date, end_date, width):
+    if len(ticks) == 0:
+        return None
+    start = pd.Timestamp(day(start_date))
+    with span('fetch'):
+        returns_service.ensure(ticks, click_start(start_date), end_date)
+        returns = returns_service.log_returns(ticks, start - rolling_lookback(window), end_date)
+    with span('compute'):
+        stats = rolling_analytics(returns, window)
+    correlation = stats['correlation']
+    if correlation.shape[1] > MAX_PAIRS:
+        correlation = correlation.mean(axis=1).to_frame('Average correlation')
+    panels = [('y', stats['volatility'], colors),
+              ('y2', stats['sharpe'], colors),
+              ('y3', correlation, colors_curr)]
+    traces = []
+    for axis, df, palette in panels:
+        df = df[df.index >= start]
+        for number, name in enumerate(df.columns):
+            color = palette[number % len(palette)]
+            series = downsample_line(df[name], width)
+            #days and four decimals are all the graph can show
+            traces.append({'x': series.index.strftime('%Y-%m-%d'), 
+                           'y': np.round(series.values, 4), 
+                           'name': name, 
+                           'legendgroup': name,
+                           'showlegend': axis != 'y2',
+                           'mode': 'lines',
+                           'xaxis': 'x',
+                           'yaxis': axis,
+                           'line': dict(color=color, width=1.5)})
+    figure = {'data': traces,
+              'layout': {'height': 700,
+                      'title': 'Rolling {}-day statistics for {}'.format(window, ', '.join(ticks)),
+                      'xaxis': {'gridcolor': '#35353b', 'anchor': 'y3'},
+                      'yaxis': {'gridcolor': '#35353b', 'domain': [0.7, 1],
+                                'title': {'text': 'Volatility'}},
+                      'yaxis2': {'gridcolor': '#35353b', 'domain': [0.37, 0.63],
+                                 'title': {'text': 'Sharpe Ratio'}},
+                      'yaxis3': {'gridcolor': '#35353b', 'domain': [0, 0.3], 'range': [-1, 1],
+                                 'title': {'text': 'Correlation'}},
+                      'plot_bgcolor': '#434247',
+                      'paper_bgcolor': '#434247',
+                      'margin': dict(t=40, b=30, l=60, r=60),
+                      'font': {'color': '#d8d8d8'}}}
+    return figure
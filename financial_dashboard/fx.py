@@ -0,0 +1,87 @@
+import json
+import os
+
+import pandas as pd
+
+from fetch import fetcher
+from history_store import HistoryStore
+from http_client import session
+from shared_cache import CACHE_DIR
+
+NBP_URL = 'http://api.nbp.pl/api/exchangerates/'
+#longest ranges the API answers in one series and one table query
+SERIES_DAYS = 367
+TABLE_DAYS = 93
+#with this many cold currencies one table query per chunk is cheaper
+BULK_FILL = 4
+
+
+def _chunks(start, end, days):
+    while start <= end:
+        stop = min(start + pd.Timedelta(days=days-1), end)
+        yield start, stop
+        start = stop + pd.Timedelta(days=1)
+
+
+def _get_json(url):
+    req = session.get(url)
+    #NBP answers 404 for a range without any quotation, e.g. a weekend
+    if req.status_code == 404:
+        return None
+    req.raise_for_status()
+    return json.loads(req.content)
+
+
+def _to_frame(dates, mids):
+    return pd.DataFrame({'mid': pd.to_numeric(mids, errors='coerce')},
+                        index=pd.DatetimeIndex(pd.to_datetime(dates), name='Date'))
+
+
+def fetch_nbp_series(curr, start, end):
+    rates = []
+    for chunk_start, chunk_end in _chunks(start, end, SERIES_DAYS):
+        data = _get_json(NBP_URL + 'rates/a/{}/{}/{}/'.format(
+            curr, chunk_start.date(), chunk_end.date()))
+        if data is not None:
+            rates.extend(data['rates'])
+    return _to_frame([rate['effectiveDate'] for rate in rates],
+                     [rate['mid'] for rate in rates])
+
+
+#every currency of table A for the range, one query per 93 days
+def fetch_nbp_tables(start, end):
+    rows = {}
+    for chunk_start, chunk_end in _chunks(start, end, TABLE_DAYS):
+        tables = _get_json(NBP_URL + 'tables/a/{}/{}/'.format(
+            chunk_start.date(), chunk_end.date()))
+        for table in tables or []:
+            for rate in table['rates']:
+                dates, mids = rows.setdefault(rate['code'], ([], []))
+                dates.append(table['effectiveDate'])
+                mids.append(rate['mid'])
+    return {curr: _to_frame(dates, mids) for curr, (dates, mids) in rows.items()}
+
+
+fx_store = HistoryStore(os.path.join(CACHE_DIR, 'fx'), fetch_nbp_series)
+
+
+def fill_all(start, end):
+    for curr, df in fetch_nbp_tables(start, end).items():
+        fx_store.merge(curr, df, start, end)
+
+
+def _is_covered(curr, start, end):
+    covered = fx_store.covered(curr)
+    return covered is not None and covered[0] <= start and covered[1] >= min(
+        end, pd.Timestamp.today().normalize() - pd.Timedelta(days=1))
+
+
+#mid rate history for each currency, in order; only days missing from the
+#local store are requested from NBP
+def get_fx_history(currs, start, end):
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    cold = [curr for curr in currs if not _is_covered(curr, start, end)]
+    if len(cold) >= BULK_FILL:
+        fill_all(start, end)
+    return fetcher.map(lambda curr: fx_store.get(curr, start, end),
+                       currs, host='api.nbp.pl')
@@ -0,0 +1,109 @@
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from shared_cache import shared_cache
+
+
+def last_closed_day():
+    #today's session may still be running, so it is never marked as stored
+    return pd.Timestamp.today().normalize() - pd.Timedelta(days=1)
+
+
+#persistent per-symbol daily history kept as memory-mapped numpy arrays;
+#past days never change, so only days outside the stored range are
+#downloaded and appended; the still open day is asked for again at most
+#once per recheck seconds
+class HistoryStore:
+    def __init__(self, directory, fetch, recheck=60*15):
+        self.directory = directory
+        self.fetch = fetch
+        self.recheck = recheck
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, name):
+        return os.path.join(self.directory, key, name)
+
+    def load(self, key):
+        try:
+            with open(self._path(key, 'meta.json')) as f:
+                meta = json.load(f)
+            dates = np.load(self._path(key, 'dates.npy'), mmap_mode='r')
+            values = np.load(self._path(key, 'values.npy'), mmap_mode='r')
+        except (OSError, ValueError):
+            return None, None
+        df = pd.DataFrame(values,
+                          index=pd.DatetimeIndex(dates, name='Date'),
+                          columns=meta['columns'])
+        meta['covered'] = (pd.Timestamp(meta['start']), pd.Timestamp(meta['end']))
+        return df, meta
+
+    def save(self, key, df, covered):
+        os.makedirs(os.path.join(self.directory, key), exist_ok=True)
+        arrays = {'dates.npy': df.index.values.astype('datetime64[ns]'),
+                  'values.npy': df.to_numpy(dtype=float)}
+        for name, array in arrays.items():
+            tmp = self._path(key, name + '.tmp')
+            with open(tmp, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp, self._path(key, name))
+        tmp = self._path(key, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'columns': list(df.columns),
+                       'start': covered[0].isoformat(),
+                       'end': covered[1].isoformat(),
+                       'checked': time.time()}, f)
+        os.replace(tmp, self._path(key, 'meta.json'))
+
+    def covered(self, key):
+        meta = self.load(key)[1]
+        return meta and meta['covered']
+
+    def _merge(self, key, df, parts, covered):
+        df = pd.concat([df] + parts).select_dtypes('number')
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        self.save(key, df, covered)
+        return df
+
+    #stores history downloaded elsewhere, e.g. a bulk request for many keys
+    def merge(self, key, df, start, end):
+        end = min(end, last_closed_day())
+        with shared_cache.lock((self.directory, key)):
+            stored, meta = self.load(key)
+            if stored is None:
+                self.save(key, df.select_dtypes('number').sort_index(), (start, end))
+                return
+            covered = meta['covered']
+            if start <= covered[1] + pd.Timedelta(days=1) and end >= covered[0] - pd.Timedelta(days=1):
+                covered = (min(start, covered[0]), max(end, covered[1]))
+            else:
+                #a disjoint range would leave a gap, so only the new one counts
+                covered = (start, end)
+            self._merge(key, stored, [df], covered)
+
+    def get(self, key, start, end):
+        with shared_cache.lock((self.directory, key)):
+            df, meta = self.load(key)
+            if df is None:
+                df = self.fetch(key, start, end).select_dtypes('number').sort_index()
+                self.save(key, df, (start, min(end, last_closed_day())))
+                return df
+
+            covered = meta['covered']
+            only_open_day = covered[1] >= last_closed_day()
+            checked_lately = time.time() - meta['checked'] < self.recheck
+            parts = []
+            if start < covered[0]:
+                parts.append(self.fetch(key, start, covered[0] - pd.Timedelta(days=1)))
+            if end > covered[1] and not (only_open_day and checked_lately):
+                parts.append(self.fetch(key, covered[1] + pd.Timedelta(days=1), end))
+            if parts:
+                #the parts reach from the request to the stored range, so
+                #the union is covered without a gap
+                covered = (min(start, covered[0]),
+                           max(min(end, last_closed_day()), covered[1]))
+                df = self._merge(key, df, parts, covered)
+        return df.loc[start:end]
@@ -0,0 +1,116 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import datasource
+from metrics import upstream_requests, upstream_seconds
+
+#connect and read timeouts in seconds
+TIMEOUT = (3.05, 10)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    pass
+
+
+#stops calling an upstream after repeated failures; after reset_timeout one
+#trial request is let through and its result closes or reopens the circuit
+class CircuitBreaker:
+    def __init__(self, max_failures=3, reset_timeout=60):
+        self.max_failures = max_failures
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.time() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.max_failures:
+                self.opened_at = time.time()
+            self._trial = False
+
+
+#shared session for every upstream: keep-alive pools per host, default
+#timeouts, bounded retries with backoff and a circuit breaker per host;
+#it is also handed to pandas_datareader
+class UpstreamSession(requests.Session):
+    def __init__(self, timeout=TIMEOUT, retries=2, pool_size=8):
+        super().__init__()
+        self.timeout = timeout
+        self.breakers = {}
+        self._lock = threading.Lock()
+        retry = Retry(total=retries,
+                      backoff_factor=0.3,
+                      status_forcelist=(500, 502, 503, 504),
+                      allowed_methods=('GET', 'HEAD'),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=16,
+                              pool_maxsize=pool_size,
+                              max_retries=retry)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+        datasource.install(self, pool_connections=16,
+                           pool_maxsize=pool_size,
+                           max_retries=retry)
+
+    def breaker(self, host):
+        with self._lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker()
+            return self.breakers[host]
+
+    def request(self, method, url, **kwargs):
+        host = urlparse(url).netloc
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            upstream_requests.inc(host, 'circuit_open')
+            raise CircuitOpenError('circuit open for {}'.format(host))
+        kwargs.setdefault('timeout', self.timeout)
+        start = time.perf_counter()
+        try:
+            response = super().request(method, url, **kwargs)
+        except requests.RequestException:
+            upstream_seconds.observe(time.perf_counter() - start, host)
+            upstream_requests.inc(host, 'error')
+            breaker.failure()
+            raise
+        upstream_seconds.observe(time.perf_counter() - start, host)
+        upstream_requests.inc(host, '{}xx'.format(response.status_code // 100))
+        if response.status_code >= 500:
+            breaker.failure()
+        else:
+            breaker.success()
+        return response
+
+
+session = UpstreamSession()
@@ -0,0 +1,156 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from http_client import session
+from metrics import fallback, listener_errors
+from prices import read_quandl
+from quotes import extract_quotes
+
+CURRCONV_KEY = 'ed6303b119a9753725a8'
+STOOQ_URL = 'https://stooq.pl/t/?i=528'
+#indices available on Quandl when stooq cannot be scraped
+QUANDL_INDICES = ['WIG', 'WIG20', 'MWIG40', 'SWIG80', 'WIG_ODZIEZ', 'WIG_LEKI']
+
+
+def fetch_indices_stooq(indices):
+    req = session.get(STOOQ_URL)
+    req.raise_for_status()
+    quotes = extract_quotes(req.text, indices)
+    missing = [index for index in indices if quotes.get(index, (None,))[0] is None]
+    if missing:
+        raise ValueError('no stooq quote for {}'.format(', '.join(missing)))
+    changes = [quotes[index][1] for index in indices]
+    return {'names': list(indices),
+            'rates': [quotes[index][0] for index in indices],
+            'changes': changes if None not in changes else None}
+
+
+def fetch_indices_quandl():
+    rates = []
+    for index in QUANDL_INDICES:
+        df = read_quandl(index, start=datetime.today().date()-timedelta(days=5))
+        #newest close, whichever order the reader returns
+        rates.append(df.sort_index()['Close'].iloc[-1])
+    return {'names': list(QUANDL_INDICES), 'rates': rates, 'changes': None}
+
+
+def fetch_indices(indices):
+    try:
+        data = fetch_indices_stooq(indices)
+        fallback('indices', 'stooq')
+    except Exception:
+        data = fetch_indices_quandl()
+        fallback('indices', 'quandl')
+    return data
+
+
+def fetch_rates_currconv(currencies):
+    rates = {}
+    #the free plan accepts two pairs per query
+    for i in range(0, len(currencies), 2):
+        pairs = ','.join(curr + '_PLN' for curr in currencies[i:i+2])
+        req = session.get('https://free.currconv.com/api/v7/convert?q={}&compact=ultra&apiKey={}'.format(
+            pairs, CURRCONV_KEY))
+        req.raise_for_status()
+        rates.update(json.loads(req.content))
+    return {'names': list(currencies),
+            'rates': [rates[curr + '_PLN'] for curr in currencies],
+            'valueformat': '.5f'}
+
+
+def fetch_rates_nbp(currencies):
+    req = session.get('http://api.nbp.pl/api/exchangerates/tables/a/')
+    mids = {rate['code']: rate['mid'] for rate in json.loads(req.content)[0]['rates']}
+    return {'names': list(currencies),
+            'rates': [mids[curr] for curr in currencies],
+            'valueformat': '.4f'}
+
+
+def fetch_exchange_rates(currencies):
+    try:
+        data = fetch_rates_currconv(currencies)
+        fallback('exchange_rates', 'currconv')
+    except Exception:
+        data = fetch_rates_nbp(currencies)
+        fallback('exchange_rates', 'nbp')
+    return data
+
+
+#single server-side refresher for market snapshots; every job runs on its
+#own schedule and callbacks only read the latest result, so upstream load
+#does not depend on the number of open dashboards
+class MarketPoller:
+    def __init__(self):
+        self._jobs = {}
+        self._snapshots = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, name, interval, func):
+        self._jobs[name] = {'interval': interval, 
+                            'func': func, 
+                            'next_run': 0,
+                            'lock': threading.RLock()}
+
+    #func(name, snapshot) is called after every successful refresh
+    def listen(self, func):
+        self._listeners.append(func)
+
+    def refresh(self, name):
+        job = self._jobs[name]
+        with job['lock']:
+            job['next_run'] = time.time() + job['interval']
+            try:
+                data = job['func']()
+            except Exception:
+                #keep serving the last good snapshot until the upstream recovers
+                snapshot = self.get(name, refresh=False)
+                fallback(name, 'stale' if snapshot is not None else 'unavailable')
+                return snapshot
+            snapshot = dict(data, updated=datetime.now())
+            with self._lock:
+                self._snapshots[name] = snapshot
+            for listener in self._listeners:
+                #a failing listener must not stop the poller thread
+                try:
+                    listener(name, snapshot)
+                except Exception:
+                    listener_errors.inc(name)
+            return snapshot
+
+    def get(self, name, refresh=True):
+        with self._lock:
+            snapshot = self._snapshots.get(name)
+        job = self._jobs[name]
+        if snapshot is None and refresh:
+            #first request came before the poller finished this job; wait
+            #for a refresh in flight or run the first one here
+            with job['lock']:
+                snapshot = self.get(name, refresh=False)
+                if snapshot is None and job['next_run'] == 0:
+                    snapshot = self.refresh(name)
+        return snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.time()
+            for name, job in list(self._jobs.items()):
+                if job['next_run'] <= now:
+                    self.refresh(name)
+            next_run = min([job['next_run'] for job in self._jobs.values()],
+                           default=now + 60)
+            self._stop.wait(max(next_run - time.time(), 1))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run,
+                                            name='market-poller',
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
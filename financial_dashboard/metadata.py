@@ -0,0 +1,87 @@
+import io
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+from http_client import session
+from shared_cache import CACHE_DIR, shared_cache
+
+METADATA_URL = 'https://raw.githubusercontent.com/wieckiewiczpiotr/sample/master/WSE_metadata.csv'
+NBP_TABLE_URL = 'http://api.nbp.pl/api/exchangerates/tables/a/'
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, 'metadata')
+#older snapshots are still served, but refreshed in the background
+MAX_AGE = 60*60*12
+
+
+def _download_companies():
+    req = session.get(METADATA_URL)
+    req.raise_for_status()
+    return pd.read_csv(io.StringIO(req.text))
+
+
+def _download_currencies():
+    req = session.get(NBP_TABLE_URL)
+    return pd.DataFrame(data=json.loads(req.content)[0]['rates'])
+
+
+def _age(path):
+    try:
+        return time.time() - os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _refresh(path, download, background=False):
+    with shared_cache.lock(('snapshot', path)):
+        age = _age(path)
+        if age is not None and age <= MAX_AGE:
+            return
+        try:
+            df = download()
+        except Exception:
+            if not background:
+                raise
+            return
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        df.to_csv(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+
+#reads a local copy of remote metadata; only the very first start waits
+#for the download
+def _snapshot(name, download, **kwargs):
+    path = os.path.join(SNAPSHOT_DIR, name)
+    age = _age(path)
+    if age is None:
+        _refresh(path, download)
+    elif age > MAX_AGE:
+        threading.Thread(target=_refresh,
+                         args=(path, download, True),
+                         daemon=True).start()
+    return pd.read_csv(path, **kwargs)
+
+
+def load_companies():
+    cmps = _snapshot('WSE_metadata.csv', _download_companies, index_col='code')
+    cmps['name'] = cmps['name'].str.split(',', expand=True)[0].str.split(
+        'for', expand=True)[1].str.lstrip()
+    cmps['name'] = cmps['name'].fillna(cmps.index.to_series())
+    return cmps
+
+
+def load_currencies():
+    return _snapshot('nbp_table_a.csv', _download_currencies,
+                     keep_default_na=False)
+
+
+def company_options(cmps):
+    return pd.DataFrame({'label': cmps['name'].values,
+                         'value': cmps.index.values}).to_dict('records')
+
+
+def currency_options(currs):
+    return pd.DataFrame({'label': currs['currency'] + ' (' + currs['code'] + ')',
+                         'value': currs['code']}).to_dict('records')
@@ -0,0 +1,230 @@
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+import flask
+from dash.exceptions import PreventUpdate
+
+#upper bounds of the latency buckets in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, _escape(v)) for k, v in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name + _labels(self.labels, labels), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        #per label set: counts per bucket, sum and count
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            counts, total, count = self._values.get(labels, ([0]*len(self.buckets), 0.0, 0))
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(counts):
+                counts[i] += 1
+            self._values[labels] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self):
+        with self._lock:
+            values = {k: (list(c), s, n) for k, (c, s, n) in self._values.items()}
+        for labels, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                yield (self.name + '_bucket' + _labels(self.labels, labels, [('le', _number(bound))]),
+                       cumulative)
+            yield self.name + '_bucket' + _labels(self.labels, labels, [('le', '+Inf')]), count
+            yield self.name + '_sum' + _labels(self.labels, labels), total
+            yield self.name + '_count' + _labels(self.labels, labels), count
+
+
+#metrics of one process; with several workers every worker keeps its own,
+#so scrape them one by one or run the dashboard in a single process
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._caches = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    #cache exposes stats() with hits and misses, read at scrape time
+    def cache(self, name, cache):
+        self._caches.append((name, cache))
+
+    def _cache_lines(self):
+        stats = [(name, cache.stats()) for name, cache in self._caches]
+        for metric, kind, help, value in [
+                ('dashboard_cache_hits_total', 'counter', 'Cache lookups answered from the cache.',
+                 lambda s: s['hits']),
+                ('dashboard_cache_misses_total', 'counter', 'Cache lookups that had to load the value.',
+                 lambda s: s['misses']),
+                ('dashboard_cache_hit_ratio', 'gauge', 'Share of cache lookups that were hits.',
+                 lambda s: s['hits'] / (s['hits'] + s['misses']) if s['hits'] + s['misses'] else 0)]:
+            yield '# HELP {} {}'.format(metric, help)
+            yield '# TYPE {} {}'.format(metric, kind)
+            for name, s in stats:
+                yield '{}{} {}'.format(metric, _labels(['cache'], [name]), _number(value(s)))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append('# HELP {} {}'.format(metric.name, metric.help))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.kind))
+            lines.extend('{} {}'.format(name, _number(value)) for name, value in metric.samples())
+        lines.extend(self._cache_lines())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+callback_seconds = registry.histogram(
+    'dashboard_callback_seconds', 'Time spent in a Dash callback.', ['callback'])
+callback_errors = registry.counter(
+    'dashboard_callback_errors_total', 'Dash callbacks that raised an exception.', ['callback'])
+phase_seconds = registry.histogram(
+    'dashboard_callback_phase_seconds', 'Time spent in the fetch, compute and render phases of a callback.',
+    ['callback', 'phase'])
+request_seconds = registry.histogram(
+    'dashboard_request_seconds', 'Time to answer a callback request, JSON serialization included.',
+    ['output'])
+upstream_seconds = registry.histogram(
+    'dashboard_upstream_seconds', 'Latency of upstream HTTP requests.', ['host'])
+upstream_requests = registry.counter(
+    'dashboard_upstream_requests_total',
+    'Upstream HTTP requests by outcome: status class, error or circuit_open.', ['host', 'outcome'])
+fallbacks = registry.counter(
+    'dashboard_fallback_total', 'Data source tier that served a market snapshot.', ['source', 'tier'])
+job_seconds = registry.histogram(
+    'dashboard_portfolio_job_seconds',
+    'Time to compute a portfolio job in the process pool, waits for a free process included.',
+    ['kind'], BUCKETS + (60, 120, 300))
+listener_errors = registry.counter(
+    'dashboard_listener_errors_total', 'Market snapshot listeners that raised an exception.', ['source'])
+
+_current = threading.local()
+
+
+def current_callback():
+    return getattr(_current, 'callback', 'background')
+
+
+#times one phase of the running callback
+@contextmanager
+def span(phase):
+    with phase_seconds.time(current_callback(), phase):
+        yield
+
+
+def fallback(source, tier):
+    fallbacks.inc(source, tier)
+
+
+def timed_callback(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        name = func.__name__
+        previous = current_callback()
+        _current.callback = name
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except PreventUpdate:
+            raise
+        except Exception:
+            callback_errors.inc(name)
+            raise
+        finally:
+            callback_seconds.observe(time.perf_counter() - start, name)
+            _current.callback = previous
+    return wrapper
+
+
+#times every server-side callback registered on app from now on and adds
+#the /metrics route to its server
+def instrument(app, path='/metrics'):
+    register = app.callback
+
+    def callback(*args, **kwargs):
+        decorator = register(*args, **kwargs)
+        return lambda func: decorator(timed_callback(func))
+    app.callback = callback
+
+    server = app.server
+
+    @server.before_request
+    def start_timer():
+        flask.g.metrics_start = time.perf_counter()
+
+    @server.after_request
+    def stop_timer(response):
+        if flask.request.path.endswith('_dash-update-component') and 'metrics_start' in flask.g:
+            body = flask.request.get_json(silent=True) or {}
+            request_seconds.observe(time.perf_counter() - flask.g.metrics_start,
+                                    body.get('output', ''))
+        return response
+
+    @server.route(path)
+    def metrics():
+        return flask.Response(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,92 @@
+import numpy as np
+
+
+def portfolio_stats(weights, mean, cov, periods):
+    mean = np.asarray(mean, dtype=float)
+    cov = np.asarray(cov, dtype=float) * periods
+    weights = np.atleast_2d(weights)
+
+    returns = weights @ mean * periods
+    volatility = np.sqrt(np.einsum('ij,jk,ik->i', weights, cov, weights))
+    sharpe = returns / volatility
+    return returns, volatility, sharpe
+
+
+#random long-only portfolios for the Markowitz scatter; returns and
+#volatility are scaled by the number of periods like the original loop did
+def simulate_portfolios(mean, cov, periods, tries, seed=None):
+    rng = np.random.default_rng(seed)
+    weights = rng.random((tries, len(mean)))
+    weights /= weights.sum(axis=1, keepdims=True)
+    return (weights,) + portfolio_stats(weights, mean, cov, periods)
+
+
+#euclidean projection of every row onto the probability simplex
+def _project_simplex(v):
+    u = -np.sort(-v, axis=1)
+    css = np.cumsum(u, axis=1) - 1
+    ind = np.arange(1, v.shape[1] + 1)
+    rho = np.count_nonzero(u - css / ind > 0, axis=1)
+    theta = css[np.arange(len(v)), rho - 1] / rho
+    return np.maximum(v - theta[:, None], 0)
+
+
+#maximizes a*mu'w - g/2*w'Sw over long-only, fully invested weights for
+#every (a, g) pair at once with accelerated projected gradient
+def _solve_batch(mean, cov, a, g, max_iter=5000, tol=1e-10):
+    n = len(mean)
+    step = 1 / (g * max(np.linalg.eigvalsh(cov)[-1], 1e-12))
+    w = np.full((len(a), n), 1 / n)
+    y, t = w, 1.0
+    for _ in range(max_iter):
+        grad = a[:, None] * mean - g[:, None] * (y @ cov)
+        w_next = _project_simplex(y + step[:, None] * grad)
+        t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        y = w_next + (t - 1) / t_next * (w_next - w)
+        done = np.abs(w_next - w).max() < tol
+        w, t = w_next, t_next
+        if done:
+            break
+    return w
+
+
+def _risk_aversions(mean, cov, points):
+    spread = max(np.ptp(mean), 1e-12)
+    scale = spread / max(np.diag(cov).min(), 1e-18)
+    return scale * np.logspace(-3, 4, points)
+
+
+def min_variance_portfolio(mean, cov, periods):
+    cov_p = np.asarray(cov, dtype=float) * periods
+    weights = _solve_batch(np.zeros(len(cov_p)), cov_p,
+                           np.zeros(1), np.ones(1))
+    return (weights[0],) + tuple(s[0] for s in portfolio_stats(
+        weights, mean, cov, periods))
+
+
+#long-only efficient frontier traced by sweeping the risk aversion of the
+#mean-variance objective; points are ordered by increasing volatility
+def efficient_frontier(mean, cov, periods, points=200):
+    mean_p = np.asarray(mean, dtype=float) * periods
+    cov_p = np.asarray(cov, dtype=float) * periods
+    g = _risk_aversions(mean_p, cov_p, points)
+    weights = _solve_batch(mean_p, cov_p, np.ones(points), g)
+    returns, volatility, sharpe = portfolio_stats(weights, mean, cov, periods)
+    order = np.argsort(volatility)
+    return weights[order], returns[order], volatility[order], sharpe[order]
+
+
+#tangency portfolio (zero risk-free rate), found on the frontier and refined
+#between the neighbouring frontier points
+def max_sharpe_portfolio(mean, cov, periods, points=200):
+    mean_p = np.asarray(mean, dtype=float) * periods
+    cov_p = np.asarray(cov, dtype=float) * periods
+    g = _risk_aversions(mean_p, cov_p, points)
+    for _ in range(2):
+        weights = _solve_batch(mean_p, cov_p, np.ones(len(g)), g)
+        sharpe = portfolio_stats(weights, mean, cov, periods)[2]
+        best = np.argmax(sharpe)
+        lo, hi = g[max(best - 1, 0)], g[min(best + 1, len(g) - 1)]
+        g = np.geomspace(lo, hi, 64)
+    return (weights[best],) + tuple(s[best] for s in portfolio_stats(
+        weights, mean, cov, periods))
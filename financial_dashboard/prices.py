@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+from pandas_datareader.quandl import QuandlReader
+
+from fetch import fetcher
+from history_store import HistoryStore
+from http_client import session, TIMEOUT
+from shared_cache import CACHE_DIR
+
+QUANDL_KEY = 'fHsXs9kzqak6UF1haCww'
+
+
+def to_day(date):
+    return pd.Timestamp(date).normalize()
+
+
+#pandas_datareader passes its own 30 s timeout to the session and retries
+#four times on top of it; one attempt bounded by TIMEOUT leaves timeouts
+#and retries to the session
+def read_quandl(symbol, start=None, end=None):
+    reader = QuandlReader('WSE/' + symbol,
+                          start=start,
+                          end=end,
+                          retry_count=0,
+                          pause=0,
+                          session=session,
+                          api_key=QUANDL_KEY)
+    reader.timeout = TIMEOUT
+    return reader.read()
+
+
+def fetch_quandl(ticker, start, end):
+    return read_quandl(ticker, start, end).sort_index()
+
+
+#in-process price history cache shared by all callbacks; entries are keyed
+#on (ticker, start, end) and a request is served from any fresh entry whose
+#range covers it, so one download per ticker feeds every chart of a click
+class PriceCache:
+    def __init__(self, fetch=fetch_quandl, max_entries=128, ttl=60*30):
+        self.fetch = fetch
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._ticker_locks = {}
+
+    def _ticker_lock(self, ticker):
+        with self._lock:
+            return self._ticker_locks.setdefault(ticker, threading.Lock())
+
+    def _lookup(self, ticker, start, end):
+        now = time.time()
+        with self._lock:
+            for key in list(self._entries):
+                df, stored_at = self._entries[key]
+                if now - stored_at > self.ttl:
+                    del self._entries[key]
+                    self.evictions += 1
+                    continue
+                if key[0] == ticker and key[1] <= start and key[2] >= end:
+                    self._entries.move_to_end(key)
+                    return df
+        return None
+
+    def _store(self, ticker, start, end, df):
+        with self._lock:
+            #a wider range makes the entries it covers redundant
+            for key in list(self._entries):
+                if key[0] == ticker and key[1] >= start and key[2] <= end:
+                    del self._entries[key]
+            self._entries[(ticker, start, end)] = (df, time.time())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, ticker, start, end):
+        start, end = to_day(start), to_day(end)
+        df = self._lookup(ticker, start, end)
+        if df is None:
+            #callbacks of one click run concurrently, so the first one to
+            #miss downloads while the others wait and then hit the cache
+            with self._ticker_lock(ticker):
+                df = self._lookup(ticker, start, end)
+                if df is None:
+                    df = self.fetch(ticker, start, end)
+                    self._store(ticker, start, end, df)
+                    with self._lock:
+                        self.misses += 1
+                    return df.copy()
+        with self._lock:
+            self.hits += 1
+        return df.loc[start:end].copy()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions}
+
+
+#per-ticker OHLCV history on disk
+price_store = HistoryStore(os.path.join(CACHE_DIR, 'ohlcv'), fetch_quandl)
+price_cache = PriceCache(fetch=price_store.get)
+
+
+def get_prices(ticker, start, end):
+    return price_cache.get(ticker, start, end)
+
+
+#downloads every missing ticker at once instead of one after another
+def get_prices_many(tickers, start, end):
+    return fetcher.map(lambda ticker: price_cache.get(ticker, start, end),
+                       tickers, host='www.quandl.com')
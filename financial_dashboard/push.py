@@ -0,0 +1,101 @@
+import json
+import queue
+import threading
+
+import flask
+
+#seconds between keep-alive comments on an idle stream
+HEARTBEAT = 15
+#events a slow client may fall behind before it is dropped; the browser
+#reconnects and gets the full state again
+BACKLOG = 64
+
+
+def _event(channel, data):
+    return 'event: {}\ndata: {}\n\n'.format(channel, json.dumps(data))
+
+
+def _values(snapshot):
+    changes = snapshot.get('changes') or [None] * len(snapshot['names'])
+    return {name: [float(rate), None if change is None else float(change)]
+            for name, rate, change in zip(snapshot['names'], snapshot['rates'], changes)}
+
+
+#Server-Sent Events channel for market snapshots; subscribers get the
+#full state when they connect and afterwards only the values that changed
+class Broadcaster:
+    def __init__(self, heartbeat=HEARTBEAT, backlog=BACKLOG):
+        self.heartbeat = heartbeat
+        self.backlog = backlog
+        self._state = {}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def _message(self, state, values, full):
+        return {'values': values,
+                'order': state['order'] if full else None,
+                'valueformat': state['valueformat'],
+                'updated': state['updated']}
+
+    def publish(self, channel, snapshot):
+        values = _values(snapshot)
+        with self._lock:
+            last = self._state.get(channel)
+            full = last is None or last['order'] != list(snapshot['names'])
+            changed = values if full else {name: value for name, value in values.items()
+                                           if last['values'].get(name) != value}
+            if not changed:
+                return
+            state = {'order': list(snapshot['names']),
+                     'values': values,
+                     'valueformat': snapshot.get('valueformat'),
+                     'updated': snapshot['updated'].strftime('%H:%M:%S')}
+            self._state[channel] = state
+            message = _event(channel, self._message(state, changed, full))
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                self._unsubscribe(subscriber)
+
+    def _unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stream(self):
+        subscriber = queue.Queue(self.backlog)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            current = [_event(channel, self._message(state, state['values'], True))
+                       for channel, state in self._state.items()]
+
+        def events():
+            try:
+                yield 'retry: 5000\n\n'
+                yield from current
+                while True:
+                    try:
+                        yield subscriber.get(timeout=self.heartbeat)
+                    except queue.Empty:
+                        with self._lock:
+                            if subscriber not in self._subscribers:
+                                return
+                        yield ': ping\n\n'
+            finally:
+                self._unsubscribe(subscriber)
+        return events()
+
+    def subscribers(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    #every open stream holds a connection, so run the server with threads
+    #or green threads (e.g. gunicorn --threads or -k gevent)
+    def route(self, server, path='/events'):
+        @server.route(path)
+        def market_events():
+            return flask.Response(self.stream(),
+                                  mimetype='text/event-stream',
+                                  headers={'Cache-Control': 'no-cache',
+                                           'X-Accel-Buffering': 'no'})
@@ -0,0 +1,92 @@
+from html.parser import HTMLParser
+
+try:
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
+
+#cells of a stooq quote table row after the symbol cell: name, rate,
+#time, change
+RATE_CELL = 2
+CHANGE_CELL = 4
+
+
+def _number(text):
+    try:
+        return float(text.strip().replace('\xa0', '').replace(' ', ''))
+    except ValueError:
+        return None
+
+
+def _rows_lxml(page):
+    for row in lxml_html.fromstring(page).iter('tr'):
+        yield [cell.text_content() for cell in row if cell.tag in ('td', 'th')]
+
+
+#fallback tokenizer: collects the text of the cells of every row
+class _RowParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'tr':
+            self._end_row()
+            self._row = []
+        elif tag in ('td', 'th') and self._row is not None:
+            self._end_cell()
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag in ('td', 'th'):
+            self._end_cell()
+        elif tag in ('tr', 'table'):
+            self._end_row()
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def _end_cell(self):
+        if self._cell is not None:
+            self._row.append(''.join(self._cell))
+            self._cell = None
+
+    def _end_row(self):
+        self._end_cell()
+        if self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+
+def _rows_stdlib(page):
+    parser = _RowParser()
+    parser.feed(page)
+    parser.close()
+    parser._end_row()
+    return parser.rows
+
+
+def table_rows(page):
+    if lxml_html is not None:
+        return _rows_lxml(page)
+    return _rows_stdlib(page)
+
+
+#symbol -> (rate, change) for the wanted symbols found on a quotes page;
+#the page is parsed once, whatever the number of symbols
+def extract_quotes(page, symbols):
+    wanted = set(symbols)
+    quotes = {}
+    for cells in table_rows(page):
+        for i, cell in enumerate(cells[:len(cells)-RATE_CELL]):
+            symbol = cell.strip()
+            if symbol in wanted and symbol not in quotes:
+                change = cells[i+CHANGE_CELL] if i + CHANGE_CELL < len(cells) else ''
+                quotes[symbol] = (_number(cells[i+RATE_CELL]), _number(change))
+                break
+        if len(quotes) == len(wanted):
+            break
+    return quotes
@@ -0,0 +1,108 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from history_store import last_closed_day
+from prices import get_prices_many, to_day
+
+
+#mean vector and pairwise-complete covariance of the columns of x (nan for
+#missing), the same statistics pandas' mean() and cov() give
+def nan_moments(x):
+    present = ~np.isnan(x)
+    filled = np.where(present, x, 0.0)
+    mask = present.astype(float)
+    mean = filled.sum(axis=0) / present.sum(axis=0)
+    pairs = mask.T @ mask
+    sums = filled.T @ mask
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = (filled.T @ filled - sums * sums.T / pairs) / (pairs - 1)
+    return mean, cov
+
+
+#aligned log close prices of the WSE universe in one float matrix (one row
+#per trading day, one column per company); columns are filled on first use
+#and extended only by the days a request is missing
+class ReturnsService:
+    def __init__(self, universe, loader=get_prices_many):
+        self.loader = loader
+        self.columns = {ticker: i for i, ticker in enumerate(universe)}
+        self.dates = pd.DatetimeIndex([])
+        self.log_prices = np.empty((0, len(self.columns)))
+        self.covered = {}
+        self._lock = threading.Lock()
+
+    def _column(self, ticker):
+        if ticker not in self.columns:
+            self.columns[ticker] = len(self.columns)
+            self.log_prices = np.hstack([self.log_prices,
+                                         np.full((len(self.dates), 1), np.nan)])
+        return self.columns[ticker]
+
+    def _missing(self, ticker, start, end):
+        if ticker not in self.covered:
+            return [(start, end)]
+        covered_start, covered_end = self.covered[ticker]
+        gaps = []
+        if start < covered_start:
+            gaps.append((start, covered_start - pd.Timedelta(days=1)))
+        if end > covered_end:
+            gaps.append((covered_end + pd.Timedelta(days=1), end))
+        return gaps
+
+    def _insert(self, frames):
+        new_dates = self.dates.union(pd.DatetimeIndex(np.unique(
+            np.concatenate([df.index.values for _, df in frames]))))
+        if len(new_dates) != len(self.dates):
+            #one reindex per batch, however many tickers arrive
+            grown = np.full((len(new_dates), self.log_prices.shape[1]), np.nan)
+            grown[new_dates.get_indexer(self.dates)] = self.log_prices
+            self.dates, self.log_prices = new_dates, grown
+        for ticker, df in frames:
+            rows = self.dates.get_indexer(df.index)
+            self.log_prices[rows, self._column(ticker)] = np.log(df['Close'].to_numpy(dtype=float))
+
+    def ensure(self, tickers, start, end):
+        start, end = to_day(start), to_day(end)
+        with self._lock:
+            wanted = [(ticker, gap) for ticker in tickers
+                      for gap in self._missing(ticker, start, end)]
+        if not wanted:
+            return
+        loaded = []
+        for gap in set(gap for _, gap in wanted):
+            names = [ticker for ticker, g in wanted if g == gap]
+            loaded.extend(zip(names, self.loader(names, gap[0], gap[1])))
+        end = min(end, last_closed_day())
+        with self._lock:
+            self._insert(loaded)
+            for ticker in tickers:
+                if ticker in self.covered:
+                    covered_start, covered_end = self.covered[ticker]
+                    self.covered[ticker] = (min(start, covered_start), max(end, covered_end))
+                else:
+                    self.covered[ticker] = (start, end)
+
+    #daily log returns of the tickers over the window, as a float matrix
+    def log_returns(self, tickers, start, end):
+        self.ensure(tickers, start, end)
+        with self._lock:
+            lo = self.dates.searchsorted(to_day(start), side='left')
+            hi = self.dates.searchsorted(to_day(end), side='right')
+            cols = [self.columns[ticker] for ticker in tickers]
+            prices = self.log_prices[lo:hi, cols]
+            dates = self.dates[lo:hi]
+        #days on which none of the tickers traded do not break the series
+        traded = ~np.isnan(prices).all(axis=1)
+        prices, dates = prices[traded], dates[traded]
+        returns = np.full_like(prices, np.nan)
+        returns[1:] = prices[1:] - prices[:-1]
+        return pd.DataFrame(returns, index=dates, columns=list(tickers))
+
+    #mean vector, covariance matrix and number of periods of the daily log
+    #returns, ready for the portfolio engine
+    def moments(self, tickers, start, end):
+        returns = self.log_returns(tickers, start, end)
+        mean, cov = nan_moments(returns.to_numpy()[1:])
+        return mean, cov, len(returns)
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+
+
+#sum of the last window rows (fewer at the start) for every row of x,
+#taken from one cumulative sum
+def rolling_sum(x, window):
+    sums = np.concatenate([np.zeros((1,) + x.shape[1:]), np.cumsum(x, axis=0)])
+    ends = np.arange(1, len(x) + 1)
+    return sums[ends] - sums[np.maximum(ends - window, 0)]
+
+
+#column means of x with all-nan columns at zero
+def _centers(x):
+    counts = (~np.isnan(x)).sum(axis=0)
+    return np.where(counts > 0, np.nansum(x, axis=0) / np.maximum(counts, 1), 0.0)
+
+
+#rolling mean and standard deviation of every column of x (nan for missing
+#values); the data is centered first, so the difference of the cumulative
+#sums does not lose precision over long histories
+def rolling_moments(x, window, min_periods):
+    present = ~np.isnan(x)
+    center = _centers(x)
+    d = np.where(present, x - center, 0.0)
+    n = rolling_sum(present.astype(float), window)
+    s1 = rolling_sum(d, window)
+    s2 = rolling_sum(d * d, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = s1 / n
+        var = np.maximum(s2 - s1 * mean, 0) / (n - 1)
+    short = n < min_periods
+    mean[short] = np.nan
+    var[short] = np.nan
+    return mean + center, np.sqrt(var)
+
+
+#rolling correlation of every pair of columns over the days both traded
+def rolling_correlation(x, window, min_periods):
+    i, j = np.triu_indices(x.shape[1], k=1)
+    present = ~np.isnan(x)
+    joint = present[:, i] & present[:, j]
+    center = _centers(x)
+    a = np.where(joint, x[:, i] - center[i], 0.0)
+    b = np.where(joint, x[:, j] - center[j], 0.0)
+    n = rolling_sum(joint.astype(float), window)
+    sa, sb = rolling_sum(a, window), rolling_sum(b, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = rolling_sum(a * b, window) - sa * sb / n
+        var_a = rolling_sum(a * a, window) - sa * sa / n
+        var_b = rolling_sum(b * b, window) - sb * sb / n
+        corr = np.clip(cov / np.sqrt(var_a * var_b), -1, 1)
+    corr[n < min_periods] = np.nan
+    return list(zip(i, j)), corr
+
+
+#annualized rolling volatility and Sharpe Ratio of every ticker and the
+#rolling correlation of every pair, from daily log returns; each costs one
+#pass over the data whatever the window
+def rolling_analytics(returns, window, periods=TRADING_DAYS):
+    x = returns.to_numpy(dtype=float)
+    min_periods = max(window // 2, 2)
+    mean, std = rolling_moments(x, window, min_periods)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sharpe = mean / std * np.sqrt(periods)
+    pairs, corr = rolling_correlation(x, window, min_periods)
+    names = ['{} / {}'.format(returns.columns[i], returns.columns[j]) for i, j in pairs]
+    return {'volatility': pd.DataFrame(std * np.sqrt(periods), index=returns.index,
+                                       columns=returns.columns),
+            'sharpe': pd.DataFrame(sharpe, index=returns.index, columns=returns.columns),
+            'correlation': pd.DataFrame(corr, index=returns.index, columns=names)}
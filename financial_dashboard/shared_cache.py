@@ -0,0 +1,199 @@
+import hashlib
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    #no cross-process locking on Windows, gunicorn does not run there anyway
+    fcntl = None
+
+CACHE_DIR = os.environ.get(
+    'DASHBOARD_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache'))
+
+#seconds between sweeps for expired entries and unused lock files, per
+#process
+SWEEP_EVERY = 60
+#every entry starts with a marker and its expiry time, so a sweep does not
+#have to unpickle it
+HEADER = struct.Struct('<4sd')
+MAGIC = b'DSC1'
+
+
+#file-backed key-value store shared by every worker process on the host;
+#a cold key is loaded by one worker while the others wait on its file lock;
+#with max_bytes the oldest entries beyond it are removed at each sweep
+class SharedCache:
+    def __init__(self, directory=os.path.join(CACHE_DIR, 'shared'), sweep_every=SWEEP_EVERY,
+                 max_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.sweep_every = sweep_every
+        self.hits = 0
+        self.misses = 0
+        #thread locks of the keys locked right now
+        self._locks = weakref.WeakValueDictionary()
+        self._guard = threading.Lock()
+        self._swept = time.time()
+        os.makedirs(directory, exist_ok=True)
+
+    def _digest(self, key):
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, self._digest(key))
+
+    #one lock file per key, as callers hold the lock while they download;
+    #the sweep removes lock files nobody holds, so a lock taken on a file
+    #removed in the meantime is taken again on the current one
+    @contextmanager
+    def lock(self, key):
+        path = self._path(key) + '.lock'
+        with self._guard:
+            thread_lock = self._locks.get(path)
+            if thread_lock is None:
+                thread_lock = self._locks[path] = threading.Lock()
+        with thread_lock:
+            while True:
+                lock_file = open(path, 'a')
+                if fcntl is None:
+                    break
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    if os.stat(path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                        break
+                except FileNotFoundError:
+                    pass
+                lock_file.close()
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+    #only while holding it, so that nobody waits on the removed file
+    def _remove_lock(self, path):
+        with open(path, 'a') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return
+            os.remove(path)
+
+    def _expires(self, f):
+        magic, expires = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise pickle.UnpicklingError('not a cache entry')
+        return expires
+
+    #unless another process has replaced the file since it was opened
+    def _remove(self, path, f):
+        try:
+            if os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                os.remove(path)
+        except OSError:
+            pass
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                if self._expires(f) < time.time():
+                    self._remove(path, f)
+                    return default
+                return pickle.load(f)
+        except (OSError, EOFError, struct.error, pickle.UnpicklingError):
+            return default
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires = now + ttl if ttl is not None else float('inf')
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, expires))
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._path(key))
+        if now - self._swept > self.sweep_every:
+            self._swept = now
+            self.sweep()
+
+    #removes expired and unreadable entries, temporary files a killed
+    #writer left behind and lock files that are not held
+    def sweep(self):
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith('.lock'):
+                    if now - os.path.getmtime(path) > self.sweep_every:
+                        self._remove_lock(path)
+                elif name.startswith('tmp'):
+                    if now - os.path.getmtime(path) > self.sweep_every:
+                        os.remove(path)
+                else:
+                    with open(path, 'rb') as f:
+                        try:
+                            expired = self._expires(f) < now
+                        except (struct.error, pickle.UnpicklingError):
+                            expired = True
+                        if expired:
+                            self._remove(path, f)
+                        else:
+                            info = os.fstat(f.fileno())
+                            entries.append((info.st_mtime, info.st_size, path))
+            except OSError:
+                pass
+        if self.max_bytes is not None:
+            size = sum(entry[1] for entry in entries)
+            for mtime, entry_size, path in sorted(entries):
+                if size <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                size -= entry_size
+
+    def get_or_set(self, key, loader, ttl=None):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            with self.lock(key):
+                value = self.get(key, missing)
+                if value is missing:
+                    self.misses += 1
+                    value = loader()
+                    self.set(key, value, ttl)
+                    return value
+        self.hits += 1
+        return value
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if not name.endswith('.lock'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+shared_cache = SharedCache()
@@ -0,0 +1,171 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from metrics import job_seconds
+from portfolio import (simulate_portfolios, efficient_frontier,
+                       min_variance_portfolio, max_sharpe_portfolio)
+from shared_cache import shared_cache
+
+CHUNK = 1000
+#how long finished or abandoned runs can still be polled
+TTL = 60*15
+WORKERS = int(os.environ.get('DASHBOARD_JOB_WORKERS', 2))
+#jobs one web worker runs at a time; further new jobs are turned away
+MAX_JOBS = 8
+#a job not published for this long died with the worker that ran it
+STALE = 60
+
+
+class QueueFull(Exception):
+    pass
+
+
+def job_id(*inputs):
+    return hashlib.sha1(repr(inputs).encode()).hexdigest()
+
+
+#pool processes are not forked from the web worker, which runs the poller
+#and request threads; the forkserver starts them from a clean process that
+#has only this module imported, spawn does where there is no forkserver
+def pool_context():
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+#runs in the pool processes
+def frontier_portfolios(mean, cov, periods):
+    return {'frontier': efficient_frontier(mean, cov, periods),
+            'min_variance': min_variance_portfolio(mean, cov, periods),
+            'max_sharpe': max_sharpe_portfolio(mean, cov, periods)}
+
+
+#runs portfolio computations in a process pool, so they neither hold a
+#web worker nor its GIL; a job is the efficient frontier and/or Monte Carlo
+#chunks, sent to the pool one task at a time by a waiting thread so that
+#jobs share the pool; the progress is published in the shared cache where
+#a poll served by any worker sees it, and identical requests join the job
+#in flight
+class SimulationRunner:
+    def __init__(self, store=shared_cache, workers=WORKERS, chunk=CHUNK, max_jobs=MAX_JOBS):
+        self.store = store
+        self.workers = workers
+        self.chunk = chunk
+        self.max_jobs = max_jobs
+        self._pool = None
+        self._drivers = ThreadPoolExecutor(max_workers=max_jobs,
+                                           thread_name_prefix='portfolio-job')
+        #job -> number of the run computing it
+        self._running = {}
+        self._runs = 0
+        self._lock = threading.Lock()
+
+    #started on first use, by the web worker process that runs the jobs
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=pool_context())
+            return self._pool
+
+    def _publish(self, job, state):
+        state['published'] = time.time()
+        self.store.set(('simulation', job), state, TTL)
+
+    def _current(self, job, run):
+        with self._lock:
+            return self._running.get(job) == run
+
+    def _release(self, job, run):
+        with self._lock:
+            if self._running.get(job) == run:
+                del self._running[job]
+
+    #the job time, waits for the pool included, is exported as
+    #dashboard_portfolio_job_seconds, as no callback span sees it
+    def _run(self, job, run, state, tasks, kind):
+        started = time.perf_counter()
+        try:
+            for number, (func, args) in enumerate(tasks):
+                result = self._executor().submit(func, *args).result()
+                if func is frontier_portfolios:
+                    state['extra'].update(result)
+                elif state['portfolios'] is None:
+                    state['portfolios'] = list(result)
+                else:
+                    state['portfolios'] = [np.concatenate([old, new]) for old, new
+                                           in zip(state['portfolios'], result)]
+                if func is simulate_portfolios:
+                    state['done'] += len(result[0])
+                if not self._current(job, run):
+                    return
+                state['finished'] = number == len(tasks) - 1
+                self._publish(job, state)
+            job_seconds.observe(time.perf_counter() - started, kind)
+        except Exception as error:
+            if isinstance(error, BrokenProcessPool):
+                #a pool process died, e.g. out of memory; start a new pool
+                with self._lock:
+                    self._pool = None
+            state['error'] = str(error) or type(error).__name__
+            state['finished'] = True
+            if self._current(job, run):
+                self._publish(job, state)
+        finally:
+            self._release(job, run)
+
+    #extra is published along with the points; frontier adds the efficient
+    #frontier and the minimum volatility and maximum Sharpe portfolios to it
+    def start(self, job, mean, cov, periods, tries, seed=None, extra=None, frontier=False):
+        with self.store.lock(('simulation', job)):
+            state = self.get(job)
+            if state is not None and (state['finished'] or
+                                      time.time() - state['published'] < STALE):
+                return state
+            with self._lock:
+                #a local run whose published state expired or was cleared
+                #is superseded by this one
+                if job not in self._running and len(self._running) >= self.max_jobs:
+                    raise QueueFull('{} portfolio jobs already running'.format(len(self._running)))
+                self._runs += 1
+                run = self._runs
+                self._running[job] = run
+            state = {'total': tries,
+                     'done': 0,
+                     'portfolios': None,
+                     'extra': dict(extra or {}),
+                     'finished': False,
+                     'error': None}
+            self._publish(job, state)
+
+        tasks = []
+        if frontier:
+            tasks.append((frontier_portfolios, (mean, cov, periods)))
+        seeds = np.random.SeedSequence(seed).spawn(-(-tries // self.chunk))
+        for i, chunk_seed in enumerate(seeds):
+            size = min(self.chunk, tries - i*self.chunk)
+            tasks.append((simulate_portfolios, (mean, cov, periods, size, chunk_seed)))
+        if tasks:
+            kind = ('both' if tries else 'frontier') if frontier else 'random'
+            self._drivers.submit(self._run, job, run, dict(state, extra=dict(state['extra'])),
+                                 tasks, kind)
+        else:
+            state['finished'] = True
+            self._publish(job, state)
+            self._release(job, run)
+        return state
+
+    def get(self, job):
+        return self.store.get(('simulation', job))
+
+
+simulations = SimulationRunner()
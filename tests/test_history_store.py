@@ -0,0 +1,59 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'financial_dashboard'))
+os.environ.setdefault('DASHBOARD_CACHE_DIR', tempfile.mkdtemp(prefix='dashboard-test-'))
+
+from history_store import HistoryStore
+
+
+class FakeFetch:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, key, start, end):
+        self.calls.append((pd.Timestamp(start), pd.Timestamp(end)))
+        index = pd.bdate_range(start, end, name='Date')
+        return pd.DataFrame({'Close': np.arange(len(index), dtype=float)}, index=index)
+
+
+def test_request_after_stored_range_keeps_stored_coverage(tmp_path):
+    fetch = FakeFetch()
+    store = HistoryStore(str(tmp_path), fetch)
+    store.get('KGHM', pd.Timestamp('2019-06-01'), pd.Timestamp('2020-09-30'))
+
+    store.get('KGHM', pd.Timestamp('2021-01-01'), pd.Timestamp('2021-02-01'))
+    assert fetch.calls[-1] == (pd.Timestamp('2020-10-01'), pd.Timestamp('2021-02-01'))
+    assert store.covered('KGHM') == (pd.Timestamp('2019-06-01'), pd.Timestamp('2021-02-01'))
+
+    calls = len(fetch.calls)
+    df = store.get('KGHM', pd.Timestamp('2020-10-01'), pd.Timestamp('2020-12-31'))
+    assert len(fetch.calls) == calls
+    assert df.index[0] == pd.Timestamp('2020-10-01')
+    assert df.index[-1] == pd.Timestamp('2020-12-31')
+
+
+def test_request_before_stored_range_keeps_stored_coverage(tmp_path):
+    fetch = FakeFetch()
+    store = HistoryStore(str(tmp_path), fetch)
+    store.get('KGHM', pd.Timestamp('2020-06-01'), pd.Timestamp('2020-09-30'))
+
+    store.get('KGHM', pd.Timestamp('2019-01-01'), pd.Timestamp('2019-03-01'))
+    assert fetch.calls[-1] == (pd.Timestamp('2019-01-01'), pd.Timestamp('2020-05-31'))
+    assert store.covered('KGHM') == (pd.Timestamp('2019-01-01'), pd.Timestamp('2020-09-30'))
+
+
+def test_disjoint_bulk_merge_replaces_coverage(tmp_path):
+    fetch = FakeFetch()
+    store = HistoryStore(str(tmp_path), fetch)
+    store.get('USD', pd.Timestamp('2019-01-01'), pd.Timestamp('2019-03-01'))
+
+    index = pd.bdate_range('2020-01-01', '2020-02-01', name='Date')
+    store.merge('USD', pd.DataFrame({'Close': 1.0}, index=index),
+                pd.Timestamp('2020-01-01'), pd.Timestamp('2020-02-01'))
+    assert store.covered('USD') == (pd.Timestamp('2020-01-01'), pd.Timestamp('2020-02-01'))